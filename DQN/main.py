@@ -1,10 +1,18 @@
+import argparse
+import os
+import sys
+from time import perf_counter
 import numpy as np
 import pygame
 import random
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mazegen import makeMaze
+from mazemodel import MazeModel
+from mazeview import MazeRenderer
 
 # Define the DQN (Neural Network) in PyTorch
 class DQN(nn.Module):
@@ -56,12 +64,190 @@ class Maze:
         state[self.agent_pos[0], self.agent_pos[1]] = 1
         return state.reshape((1, -1))
 
+# Vectorized Maze Environment
+class VecMaze:
+    """n_envs agents on one walled maze grid (a makeMaze grid by default), all stepped by
+    one table lookup. Observations are one-hot (n_envs, rows * cols) tensors written into
+    two preallocated buffers in turn, so the observation returned by one step stays valid
+    through the next one and can go straight into the replay memory. Agents are reset
+    explicitly with reset(mask) once done, bumping into a wall leaves an agent in place"""
+    def __init__(self, grid=None, n_envs=64, size=5, start=(1, 1), goal=None):
+        if grid is None:
+            grid = makeMaze(size)
+        self.model = MazeModel.parse(grid, start, goal)
+        n_rows, n_cols = self.model.grid.shape
+        goal = self.model.goal or (n_rows - 2, n_cols - 2)
+        self.n_envs = n_envs
+        self.state_size = self.model.n_cells
+        self.start_cell = self.model.to_cell(*self.model.start)
+        self.goal_cell = self.model.to_cell(*goal)
+
+        # next_cell[cell, action] with walls and the border folded in
+        next_cell, valid = self.model.move_table()
+        cells = np.arange(self.model.n_cells)[:, None]
+        self.next_cell = torch.from_numpy(np.where(valid, next_cell, cells))
+
+        self.rows = torch.arange(n_envs)
+        self.cells = torch.full((n_envs,), self.start_cell, dtype=torch.int64)
+        self.buffers = [torch.zeros(n_envs, self.state_size) for _ in range(2)]
+        self.buffer_cells = [self.cells.clone(), self.cells.clone()]
+        self.current = 0
+        self.buffers[0][self.rows, self.cells] = 1
+        self.buffers[1][self.rows, self.cells] = 1
+
+    def reset(self, mask=None):
+        """Send every agent, or the ones where mask is True, back to the start"""
+        obs, obs_cells = self.buffers[self.current], self.buffer_cells[self.current]
+        rows = self.rows if mask is None else self.rows[mask]
+        obs[rows, obs_cells[rows]] = 0
+        obs[rows, self.start_cell] = 1
+        obs_cells[rows] = self.start_cell
+        self.cells[rows] = self.start_cell
+        return obs
+
+    def step(self, actions):
+        """Move every agent, returns (observations, rewards, dones) tensors"""
+        self.cells = self.next_cell[self.cells, actions]
+        self.current = 1 - self.current
+        obs, obs_cells = self.buffers[self.current], self.buffer_cells[self.current]
+        obs[self.rows, obs_cells] = 0
+        obs[self.rows, self.cells] = 1
+        obs_cells.copy_(self.cells)
+
+        dones = self.cells == self.goal_cell
+        return obs, dones.float(), dones
+
+# Replay memory
+class ReplayBuffer:
+    """Fixed-capacity ring buffer of transitions in preallocated arrays, overwriting the
+    oldest once full. sample() draws a whole minibatch with one vectorized index"""
+    def __init__(self, capacity, state_size, rng=None):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.index = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, state, action, reward, next_state, done):
+        i = self.index
+        self.states[i] = state.reshape(-1)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state.reshape(-1)
+        self.dones[i] = done
+        self.index = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def push_batch(self, states, actions, rewards, next_states, dones):
+        """push for a batch of transitions, arrays or tensors with one row per transition"""
+        n = min(len(actions), self.capacity)
+        idx = (self.index + np.arange(n)) % self.capacity
+        self.states[idx] = np.asarray(states)[-n:]
+        self.actions[idx] = np.asarray(actions)[-n:]
+        self.rewards[idx] = np.asarray(rewards)[-n:]
+        self.next_states[idx] = np.asarray(next_states)[-n:]
+        self.dones[idx] = np.asarray(dones)[-n:]
+        self.index = (self.index + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+        return idx
+
+    def sample(self, batch_size):
+        """(states, actions, rewards, next_states, dones) tensors for batch_size random transitions"""
+        idx = self.rng.integers(0, self.size, batch_size)
+        return (torch.from_numpy(self.states[idx]), torch.from_numpy(self.actions[idx]),
+                torch.from_numpy(self.rewards[idx]), torch.from_numpy(self.next_states[idx]),
+                torch.from_numpy(self.dones[idx]))
+
+class SumTree:
+    """Binary tree over capacity leaf priorities where every node holds the sum of its
+    children. Leaves live at tree[leaves + i] with leaves a power of two, the root at
+    tree[1]. Updates and prefix-sum lookups walk one level at a time for a whole batch"""
+    def __init__(self, capacity):
+        self.leaves = 1 << max(capacity - 1, 0).bit_length()
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def update(self, idx, priorities):
+        node = np.asarray(idx) + self.leaves
+        self.tree[node] = priorities
+        node = np.unique(node // 2)
+        while node[0] > 0:
+            self.tree[node] = self.tree[2 * node] + self.tree[2 * node + 1]
+            node = np.unique(node // 2)
+
+    def find(self, values):
+        """Leaf index whose prefix-sum range contains each value"""
+        node = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        while node[0] < self.leaves:
+            left = self.tree[2 * node]
+            right = values >= left
+            values -= left * right
+            node = 2 * node + right
+        return node - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Replay buffer sampling transitions in proportion to priority ** alpha, with a sum-tree
+    for O(log n) sampling and priority updates. New transitions get the highest priority
+    seen so far, so each is replayed at least once. sample() also returns the indices to
+    pass back to update_priorities and importance-sampling weights, with beta annealed
+    towards 1 by beta_increment per sample"""
+    def __init__(self, capacity, state_size, alpha=0.6, beta=0.4, beta_increment=0.001, eps=1e-5, rng=None):
+        super().__init__(capacity, state_size, rng)
+        self.tree = SumTree(capacity)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.eps = eps
+        self.max_priority = 1.0
+
+    def push(self, state, action, reward, next_state, done):
+        self.tree.update([self.index], self.max_priority)
+        super().push(state, action, reward, next_state, done)
+
+    def push_batch(self, states, actions, rewards, next_states, dones):
+        idx = super().push_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(idx, self.max_priority)
+        return idx
+
+    def sample(self, batch_size):
+        """Stratified draw, one value from each of batch_size equal slices of the total priority"""
+        total = self.tree.total()
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        idx = np.minimum(self.tree.find(np.minimum(values, np.nextafter(total, 0))), self.size - 1)
+
+        probs = self.tree.tree[idx + self.tree.leaves] / total
+        weights = (self.size * probs) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return (torch.from_numpy(self.states[idx]), torch.from_numpy(self.actions[idx]),
+                torch.from_numpy(self.rewards[idx]), torch.from_numpy(self.next_states[idx]),
+                torch.from_numpy(self.dones[idx]), idx, torch.from_numpy(weights.astype(np.float32)))
+
+    def update_priorities(self, idx, td_errors):
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.tree.update(idx, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
 # DQN Agent
 class DQNAgent:
-    def __init__(self, state_size, action_size):
+    def __init__(self, state_size, action_size, prioritized=False, memory_size=2000):
         self.state_size = state_size
         self.action_size = action_size
-        self.memory = deque(maxlen=2000)
+        self.prioritized = prioritized  # Sample transitions by TD error instead of uniformly
+        buffer = PrioritizedReplayBuffer if prioritized else ReplayBuffer
+        self.memory = buffer(memory_size, state_size)
         self.gamma = 0.95    # discount factor
         self.epsilon = 1.0   # exploration rate
         self.epsilon_min = 0.01
@@ -69,115 +255,162 @@ class DQNAgent:
         self.learning_rate = 0.001
         self.model = DQN(state_size, action_size)
         self.optimizer = optim.Adam(self.model.parameters(), lr=self.learning_rate)
+        self.state_buffer = torch.zeros(1, state_size)  # Reused input for single-state act
 
     def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.push(state, action, reward, next_state, done)
+
+    def remember_batch(self, states, actions, rewards, next_states, dones):
+        self.memory.push_batch(states, actions, rewards, next_states, dones)
 
     def act(self, state):
+        """Epsilon-greedy action for one NumPy state, or a tensor of actions for a whole
+        (n_envs, state_size) tensor of states from one forward pass"""
+        if isinstance(state, torch.Tensor):
+            actions = self.greedy(state)
+            explore = torch.rand(len(actions)) <= self.epsilon
+            return torch.where(explore, torch.randint(self.action_size, actions.shape), actions)
         if random.random() <= self.epsilon:
             return random.randrange(self.action_size)
-        state = torch.from_numpy(state).float()
-        act_values = self.model(state)
-        return torch.argmax(act_values).item()
+        with torch.inference_mode():
+            self.state_buffer.copy_(torch.from_numpy(state).reshape(1, -1))
+            return torch.argmax(self.model(self.state_buffer)).item()
+
+    def greedy(self, states):
+        """Greedy actions for a batch of states, a tensor or array with one state per row"""
+        if not isinstance(states, torch.Tensor):
+            states = torch.from_numpy(np.asarray(states, dtype=np.float32))
+        with torch.inference_mode():
+            return torch.argmax(self.model(states.reshape(-1, self.state_size)), dim=1)
+
+    def export(self, path, format="state_dict"):
+        """Save the trained network for serving. "state_dict" is loaded back with
+        DQN(state_size, action_size).load_state_dict(torch.load(path)), "torchscript" with
+        torch.jit.load(path) and no copy of this file, "numpy" writes an .npz of the
+        weights for policy.NumpyPolicy, which runs without torch"""
+        self.model.eval()
+        if format == "state_dict":
+            torch.save(self.model.state_dict(), path)
+        elif format == "torchscript":
+            torch.jit.script(self.model).save(path)
+        elif format == "numpy":
+            np.savez(path, **{name: value.detach().cpu().numpy()
+                              for name, value in self.model.state_dict().items()})
+        else:
+            raise ValueError(f"unknown format {format!r}")
+        self.model.train()
 
     def replay(self, batch_size):
         if len(self.memory) < batch_size:
             return
-        minibatch = random.sample(self.memory, batch_size)
-        for state, action, reward, next_state, done in minibatch:
-            state = torch.from_numpy(state).float()
-            next_state = torch.from_numpy(next_state).float()
-            reward = torch.tensor(reward)
-            action = torch.tensor(action)
-            done = torch.tensor(done)
-
-            target = reward
-            if not done:
-                target = reward + self.gamma * torch.max(self.model(next_state).detach())
-            output = self.model(state)
-            target_f = output.clone()
-            target_f[0][action] = target
+        if self.prioritized:
+            states, actions, rewards, next_states, dones, idx, weights = self.memory.sample(batch_size)
+        else:
+            states, actions, rewards, next_states, dones = self.memory.sample(batch_size)
+
+        # One forward pass for the whole minibatch, terminal transitions get no bootstrap
+        with torch.no_grad():
+            next_q = self.model(next_states).max(dim=1).values
+        targets = rewards + self.gamma * next_q * (1 - dones)
+
+        output = self.model(states)
+        target_f = output.detach().clone()
+        target_f[torch.arange(batch_size), actions] = targets
+        if self.prioritized:
+            # Importance-sampling weights undo the bias of sampling by priority
+            loss = (weights * ((output - target_f) ** 2).mean(dim=1)).mean()
+            td_errors = targets - output.detach()[torch.arange(batch_size), actions]
+            self.memory.update_priorities(idx, td_errors.numpy())
+        else:
             loss = nn.MSELoss()(output, target_f)
 
-            self.optimizer.zero_grad()
-            loss.backward()
-            self.optimizer.step()
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
 
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
 
+def grid_surface(env):
+    """The static grid, outlined cells and the goal, drawn once for MazeRenderer"""
+    surface = pygame.Surface((env.size * 100, env.size * 100))
+    for i in range(env.size):
+        for j in range(env.size):
+            rect = pygame.Rect(j * 100, i * 100, 100, 100)
+            if [i, j] == env.goal_pos:
+                pygame.draw.rect(surface, (0, 255, 0), rect)
+            else:
+                pygame.draw.rect(surface, (255, 255, 255), rect, 1)
+    return surface
+
 def visualize_path(screen, path, env):
-    visited = set()  # Keep track of visited positions
     font = pygame.font.Font(None, 36)
+    renderer = MazeRenderer(screen, grid_surface(env))
+    episode_text = font.render("Best Path", True, (255, 255, 255))
     for pos, action in path:
-        visited.add(tuple(pos))  # Add position to visited set
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return
 
-        screen.fill((0, 0, 0))
-        episode_text = font.render("Best Path", True, (255, 255, 255))
-        screen.blit(episode_text, (10, 10))  # Adjust position as needed
-
-        for i in range(env.size):
-            for j in range(env.size):
-                rect = pygame.Rect(j * 100, i * 100, 100, 100)
-                if (i, j) in visited:
-                    pygame.draw.rect(screen, (255, 200, 0), rect)  # Draw visited path in a different color
-                elif [i, j] == env.goal_pos:
-                    pygame.draw.rect(screen, (0, 255, 0), rect)
-                else:
-                    pygame.draw.rect(screen, (255, 255, 255), rect, 1)
-
-        pygame.display.flip()
+        # Visited cells stay coloured, so they go into the background
+        renderer.stamp((255, 200, 0), (pos[1] * 100, pos[0] * 100, 100, 100))
+        renderer.clear()
+        renderer.blit(episode_text, (10, 10))  # Adjust position as needed
+        renderer.flip()
         pygame.time.wait(500)  # Time delay for each step
 
     pygame.time.wait(20000)
 
 # Main loop with Pygame
-def main():
-    pygame.init()
-    font = pygame.font.Font(None, 36)
+def main(n_episodes=50, render_every=1, fps=60):
+    """Train the agent for n_episodes, drawing every render_every-th episode at fps frames
+    per second. render_every=None trains headless with no window and no frame cap, use
+    visualize_path afterwards to watch the best path"""
+    headless = not render_every
+    if not headless:
+        pygame.init()
+        font = pygame.font.Font(None, 36)
     env = Maze(size=4)
     state_size = env.size * env.size
     action_size = 4  # Up, Down, Left, Right
     agent = DQNAgent(state_size, action_size)
-    screen = pygame.display.set_mode((400, 400))
+    screen = None if headless else pygame.display.set_mode((400, 400))
+    renderer = None if headless else MazeRenderer(screen, grid_surface(env))
     clock = pygame.time.Clock()
     best_path = []
     best_length = float('inf')
+    total_steps = 0
+    start_time = perf_counter()
 
-    for e in range(50):  # episodes
+    for e in range(n_episodes):  # episodes
         state = env.reset()
         current_path = []
+        render = not headless and e % render_every == 0
+        if render:
+            episode_text = font.render(f'Episode: {e + 1}', True, (255, 255, 255))
         for time in range(2000):  # time steps
             action = agent.act(state)
             next_state, reward, done = env.step(action)
             current_path.append((env.agent_pos.copy(), action))  # Store position and action
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return
+            total_steps += 1
+            if screen is not None:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pygame.quit()
+                        return best_path
+                    if event.type == pygame.VIDEOEXPOSE:
+                        renderer.redraw()
 
             agent.remember(state, action, reward, next_state, done)
             state = next_state
 
-            screen.fill((0, 0, 0))
-
-            # Render the episode counter
-            episode_text = font.render(f'Episode: {e + 1}', True, (255, 255, 255))
-            screen.blit(episode_text, (10, 10))  # Adjust position as needed
-
-            for i in range(env.size):
-                for j in range(env.size):
-                    rect = pygame.Rect(j * 100, i * 100, 100, 100)
-                    if [i, j] == env.agent_pos:
-                        pygame.draw.rect(screen, (0, 0, 255), rect)
-                    elif [i, j] == env.goal_pos:
-                        pygame.draw.rect(screen, (0, 255, 0), rect)
-                    else:
-                        pygame.draw.rect(screen, (255, 255, 255), rect, 1)
-            pygame.display.flip()
+            if render:
+                # Only the agent's cell and the episode counter change between frames
+                renderer.clear()
+                i, j = env.agent_pos
+                renderer.rect((0, 0, 255), (j * 100, i * 100, 100, 100))
+                renderer.blit(episode_text, (10, 10))  # Adjust position as needed
+                renderer.flip()
 
             if done:
                 if time < best_length:
@@ -186,14 +419,60 @@ def main():
                 break
 
             agent.replay(32)
-            clock.tick(60)
-        
+            if render:
+                clock.tick(fps)
+
+    elapsed = perf_counter() - start_time
+    print(f"{n_episodes} episodes, {total_steps} steps in {elapsed:.2f}s ({total_steps / elapsed:.0f} steps/sec)")
     return best_path
 
+def train_vec(size=4, n_envs=64, n_steps=2000, max_steps=1000, batch_size=64):
+    """Headless training on a makeMaze(size) maze with n_envs agents stepped together, one
+    batched act, one batched remember and one replay per step. Agents restart after
+    reaching the goal or max_steps steps. Returns (agent, env)"""
+    env = VecMaze(n_envs=n_envs, size=size)
+    agent = DQNAgent(env.state_size, 4, memory_size=max(2000, 50 * n_envs))
+    obs = env.reset()
+    ages = torch.zeros(n_envs, dtype=torch.int64)
+    goals = 0
+    start_time = perf_counter()
+
+    for step in range(n_steps):
+        actions = agent.act(obs)
+        next_obs, rewards, dones = env.step(actions)
+        agent.remember_batch(obs, actions, rewards, next_obs, dones)
+        agent.replay(batch_size)
+
+        ages += 1
+        finished = dones | (ages >= max_steps)
+        ages[finished] = 0
+        goals += int(dones.sum())
+        obs = env.reset(finished)
+
+    elapsed = perf_counter() - start_time
+    print(f"{n_envs} agents, {n_steps * n_envs} steps in {elapsed:.2f}s "
+          f"({n_steps * n_envs / elapsed:.0f} steps/sec), goal reached {goals} times")
+    return agent, env
+
 if __name__ == "__main__":
-    best_path = main()
+    parser = argparse.ArgumentParser(description="Train a DQN agent on the grid maze")
+    parser.add_argument("--episodes", type=int, default=50)
+    parser.add_argument("--render-every", type=int, default=1, help="draw every Nth episode, 0 for none")
+    parser.add_argument("--headless", action="store_true", help="train without a display and skip the replay")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--envs", type=int, default=0, help="train N agents at once on a makeMaze maze, headless")
+    parser.add_argument("--maze-size", type=int, default=4)
+    args = parser.parse_args()
+    if args.envs:
+        train_vec(args.maze_size, args.envs)
+        sys.exit()
+    if args.headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Nothing is drawn, don't need a display
+
+    headless = args.headless or not args.render_every
+    best_path = main(args.episodes, None if headless else args.render_every, args.fps)
     print(best_path)
-    pygame.init()
-    screen = pygame.display.set_mode((400, 400))
-    visualize_path(screen, best_path, Maze(size=4))
-    
+    if not args.headless:
+        pygame.init()
+        screen = pygame.display.set_mode((400, 400))
+        visualize_path(screen, best_path, Maze(size=4))
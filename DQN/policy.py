@@ -0,0 +1,31 @@
+import numpy as np
+
+
+class NumpyPolicy:
+    """Greedy policy from a DQN exported with DQNAgent.export(path, "numpy"), evaluated
+    in plain NumPy so serving a trained agent doesn't import torch.
+
+    The .npz holds the Linear layers' weight and bias in order, with ReLU between them
+    like DQN.forward.
+    """
+    def __init__(self, path):
+        with np.load(path) as weights:
+            names = [name[:-len(".weight")] for name in weights.files if name.endswith(".weight")]
+            # Stored transposed so a batch of row states is a plain states @ W + b
+            self.layers = [(np.ascontiguousarray(weights[f"{name}.weight"].T), weights[f"{name}.bias"])
+                           for name in names]
+        self.state_size = self.layers[0][0].shape[0]
+        self.action_size = self.layers[-1][0].shape[1]
+
+    def q_values(self, states):
+        """Q-values for one state or a batch of states, one row each"""
+        x = np.asarray(states, dtype=np.float32).reshape(-1, self.state_size)
+        for i, (weight, bias) in enumerate(self.layers):
+            x = x @ weight + bias
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0, out=x)
+        return x
+
+    def act(self, states):
+        """Greedy action for every state"""
+        return np.argmax(self.q_values(states), axis=1)
@@ -0,0 +1,56 @@
+import time
+import numpy as np
+import torch
+from main import Maze, DQNAgent
+
+
+def greedy_reaches_goal(agent, env, max_steps):
+    """Whether the agent's greedy policy walks from the start to the goal"""
+    state = env.reset()
+    for _ in range(max_steps):
+        with torch.no_grad():
+            action = int(torch.argmax(agent.model(torch.from_numpy(state).float())))
+        state, _, done = env.step(action)
+        if done:
+            return True
+    return False
+
+
+def episodes_to_goal(prioritized, size=10, seed=0, n_episodes=300, max_steps=200, batch_size=32):
+    """Episodes of training until the greedy policy first reaches the goal, or None"""
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    env = Maze(size=size)
+    agent = DQNAgent(size * size, 4, prioritized=prioritized)
+    agent.memory.rng = np.random.default_rng(seed)
+
+    for e in range(n_episodes):
+        state = env.reset()
+        for _ in range(max_steps):
+            action = agent.act(state)
+            next_state, reward, done = env.step(action)
+            agent.remember(state, action, reward, next_state, done)
+            state = next_state
+            agent.replay(batch_size)
+            if done:
+                break
+        if greedy_reaches_goal(agent, env, 2 * size * size):
+            return e + 1
+    return None
+
+
+if __name__ == "__main__":
+    import random
+
+    seeds = range(5)
+    for prioritized in (False, True):
+        t0 = time.perf_counter()
+        results = []
+        for seed in seeds:
+            random.seed(seed)  # DQNAgent.act explores with the random module
+            results.append(episodes_to_goal(prioritized, seed=seed))
+        solved = [r for r in results if r is not None]
+        name = "prioritized" if prioritized else "uniform"
+        print(f"{name:>11}: episodes to goal {results}, "
+              f"mean {np.mean(solved) if solved else float('nan'):.1f} over {len(solved)}/{len(results)} seeds, "
+              f"{time.perf_counter() - t0:.1f}s")
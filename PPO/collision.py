@@ -0,0 +1,143 @@
+import numpy as np
+
+
+def boxes_from_grid(grid, cell_px):
+    """Wall boxes (x, y, w, h) in pixels for a 0/1 maze grid like mazegen.makeMaze returns,
+    one box per horizontal run of wall cells"""
+    walls = np.asarray(grid) == 1
+    padded = np.pad(walls, ((0, 0), (1, 1))).astype(np.int8)
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return np.stack((starts * cell_px, rows * cell_px, (ends - starts) * cell_px,
+                     np.full(len(rows), cell_px)), axis=1).astype(np.int64)
+
+
+def maze_layout(walls=None, grid=None, cell_px=40):
+    """(width, height, start_pos, walls) of a maze. walls is a list of (x, y, w, h) boxes,
+    or grid a 0/1 maze like mazegen.makeMaze returns, drawn with cell_px pixel cells and
+    the agent starting in cell (1, 1). Neither gives the default four-wall room"""
+    width, height = 600, 400
+    start_pos = np.array([width / 4, height / 2])
+    if grid is not None:
+        grid = np.asarray(grid)
+        height, width = grid.shape[0] * cell_px, grid.shape[1] * cell_px
+        start_pos = np.array([1.5 * cell_px, 1.5 * cell_px])
+        walls = boxes_from_grid(grid, cell_px)
+    if walls is None:
+        walls = [
+            (100, 50, 150, 10),
+            (100, 250, 200, 10),
+            (100, 50, 10, 200),
+            (290, 60, 10, 190)
+            # Add more walls as needed
+        ]
+    return width, height, start_pos, [tuple(int(v) for v in wall) for wall in walls]
+
+
+class WallIndex:
+    """Axis-aligned wall boxes in a uniform-grid spatial hash, so a collision query only
+    tests the walls sharing a bucket with the agent instead of every wall.
+
+    walls are (x, y, w, h) tuples, pygame.Rect objects or an (n, 4) array. Buckets are
+    cell_size pixels square and stored as one (offsets, wall ids) pair, built once.
+    Queries match pygame's Rect.colliderect: the agent is the square
+    pygame.Rect(x - r, y - r, 2r, 2r) with the corner truncated towards zero, boxes that
+    only touch don't collide. shape="circle" tests the disc of radius r instead.
+    """
+    def __init__(self, walls, cell_size=32):
+        boxes = np.array([tuple(wall) for wall in walls], dtype=np.int64).reshape(-1, 4)
+        boxes = boxes[(boxes[:, 2] > 0) & (boxes[:, 3] > 0)]  # Empty rects never collide
+        self.left, self.top = boxes[:, 0], boxes[:, 1]
+        self.right, self.bottom = boxes[:, 0] + boxes[:, 2], boxes[:, 1] + boxes[:, 3]
+        self.n_walls = len(boxes)
+        self.cell_size = cell_size
+
+        # Bucket range of every wall, the -1 keeps a wall ending on a bucket edge out of the next one
+        if self.n_walls:
+            self.origin = np.array([self.left.min(), self.top.min()])
+            c0, r0 = self.bucket(self.left, self.top)
+            c1, r1 = self.bucket(self.right - 1, self.bottom - 1)
+        else:
+            self.origin = np.zeros(2, dtype=np.int64)
+            c0 = r0 = c1 = r1 = np.zeros(0, dtype=np.int64)
+        self.n_cols = int(c1.max()) + 1 if self.n_walls else 1
+        self.n_rows = int(r1.max()) + 1 if self.n_walls else 1
+
+        spans = (c1 - c0 + 1) * (r1 - r0 + 1)
+        wall = np.repeat(np.arange(self.n_walls), spans)
+        k = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+        width = (c1 - c0 + 1)[wall]
+        bucket = (r0[wall] + k // width) * self.n_cols + c0[wall] + k % width
+
+        order = np.argsort(bucket, kind="stable")
+        self.wall_ids = wall[order]
+        self.offsets = np.zeros(self.n_rows * self.n_cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(bucket, minlength=self.n_rows * self.n_cols), out=self.offsets[1:])
+
+        # Plain Python copy of the buckets for single queries, where NumPy's per-call overhead dominates
+        walls = list(zip(self.left.tolist(), self.top.tolist(), self.right.tolist(), self.bottom.tolist()))
+        ids, offsets = self.wall_ids.tolist(), self.offsets.tolist()
+        self.buckets = [[walls[i] for i in ids[offsets[b]:offsets[b + 1]]] for b in range(len(offsets) - 1)]
+
+    def bucket(self, x, y):
+        return (x - self.origin[0]) // self.cell_size, (y - self.origin[1]) // self.cell_size
+
+    def candidates(self, left, top, right, bottom):
+        """(query index, wall id) pairs for every wall bucketed under each query box"""
+        c0, r0 = self.bucket(left, top)
+        c1, r1 = self.bucket(right - 1, bottom - 1)
+        c0, r0 = np.maximum(c0, 0), np.maximum(r0, 0)
+        c1, r1 = np.minimum(c1, self.n_cols - 1), np.minimum(r1, self.n_rows - 1)
+        cols, rows = np.maximum(c1 - c0 + 1, 0), np.maximum(r1 - r0 + 1, 0)
+
+        # Expand every query into the buckets it covers, then every bucket into its walls
+        query = np.repeat(np.arange(len(left)), cols * rows)
+        k = np.arange(len(query)) - np.repeat(np.cumsum(cols * rows) - cols * rows, cols * rows)
+        bucket = (r0[query] + k // cols[query]) * self.n_cols + c0[query] + k % cols[query]
+        counts = self.offsets[bucket + 1] - self.offsets[bucket]
+        starts = np.repeat(self.offsets[bucket] - np.cumsum(counts) + counts, counts)
+        walls = self.wall_ids[starts + np.arange(counts.sum())]
+        return np.repeat(query, counts), walls
+
+    def collides(self, positions, radius, shape="box"):
+        """Whether an agent of the given radius at each (x, y) row of positions hits a wall"""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if shape == "box":
+            left = np.trunc(positions[:, 0] - radius).astype(np.int64)
+            top = np.trunc(positions[:, 1] - radius).astype(np.int64)
+            right, bottom = left + int(2 * radius), top + int(2 * radius)
+        elif shape == "circle":
+            left = np.floor(positions[:, 0] - radius).astype(np.int64)
+            top = np.floor(positions[:, 1] - radius).astype(np.int64)
+            right = np.ceil(positions[:, 0] + radius).astype(np.int64) + 1
+            bottom = np.ceil(positions[:, 1] + radius).astype(np.int64) + 1
+        else:
+            raise ValueError(f"unknown shape {shape!r}")
+
+        query, wall = self.candidates(left, top, right, bottom)
+        if shape == "box":
+            hit = ((left[query] < self.right[wall]) & (self.left[wall] < right[query])
+                   & (top[query] < self.bottom[wall]) & (self.top[wall] < bottom[query]))
+        else:
+            x, y = positions[query, 0], positions[query, 1]
+            dx = x - np.clip(x, self.left[wall], self.right[wall])
+            dy = y - np.clip(y, self.top[wall], self.bottom[wall])
+            hit = dx * dx + dy * dy < radius * radius
+        return np.bincount(query[hit], minlength=len(positions)) > 0
+
+    def collide(self, position, radius, shape="box"):
+        """collides for a single (x, y)"""
+        if shape != "box":
+            return bool(self.collides(position, radius, shape)[0])
+        left, top = int(float(position[0]) - radius), int(float(position[1]) - radius)
+        right, bottom = left + int(2 * radius), top + int(2 * radius)
+        ox, oy, size = int(self.origin[0]), int(self.origin[1]), self.cell_size
+        c0, c1 = max((left - ox) // size, 0), min((right - 1 - ox) // size, self.n_cols - 1)
+        r0, r1 = max((top - oy) // size, 0), min((bottom - 1 - oy) // size, self.n_rows - 1)
+        for row in range(r0, r1 + 1):
+            for col in range(c0, c1 + 1):
+                for wall_left, wall_top, wall_right, wall_bottom in self.buckets[row * self.n_cols + col]:
+                    if left < wall_right and wall_left < right and top < wall_bottom and wall_top < bottom:
+                        return True
+        return False
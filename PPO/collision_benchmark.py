@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import numpy as np
+import pygame
+from collision import WallIndex, boxes_from_grid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mazegen import makeMaze
+
+
+def run(check, start, size, n_steps, seed, radius=10, speed=5.0):
+    """ContinuousMazeEnv.step's movement rule with a given collision check, returns the path"""
+    rng = np.random.default_rng(seed)
+    actions = rng.uniform(-5.0, 5.0, (n_steps, 2))
+    pos = np.array(start, dtype=np.float64)
+    path = np.empty((n_steps, 2))
+    for i in range(n_steps):
+        new_pos = pos + actions[i] * speed
+        if not check(new_pos):
+            pos = new_pos
+        pos = np.clip(pos, radius, size - radius)
+        path[i] = pos
+    return path
+
+
+if __name__ == "__main__":
+    radius, cell_px, n_steps = 10, 40, 5000
+    for maze_size in (2, 8, 24, 64):
+        grid = np.array(makeMaze(maze_size))
+        boxes = boxes_from_grid(grid, cell_px)
+        rects = [pygame.Rect(*box) for box in boxes]
+        index = WallIndex(boxes, cell_size=32)
+        size = np.array([grid.shape[1], grid.shape[0]]) * cell_px
+        start = (1.5 * cell_px, 1.5 * cell_px)
+
+        def pygame_check(p):
+            agent = pygame.Rect(p[0] - radius, p[1] - radius, radius * 2, radius * 2)
+            return any(agent.colliderect(wall) for wall in rects)
+
+        timings = []
+        for check in (pygame_check, lambda p: index.collide(p, radius)):
+            t0 = time.perf_counter()
+            path = run(check, start, size, n_steps, seed=0)
+            timings.append((n_steps / (time.perf_counter() - t0), path))
+        (slow, expected), (fast, path) = timings
+        print(f"{len(boxes):6d} walls: pygame {slow:9.0f} steps/sec, spatial hash {fast:9.0f} steps/sec, "
+              f"identical paths: {np.array_equal(expected, path)}")
@@ -2,32 +2,33 @@ import gym
 import pygame
 import numpy as np
 from gym import spaces
+from collision import WallIndex, maze_layout
+
 
 class ContinuousMazeEnv(gym.Env):
-    def __init__(self):
+    metadata = {'render.modes': ['human', 'rgb_array']}
+
+    def __init__(self, walls=None, grid=None, cell_px=40):
+        """Single agent in a maze_layout(walls, grid, cell_px) maze"""
         super(ContinuousMazeEnv, self).__init__()
 
-        self.width, self.height = 600, 400
+        self.width, self.height, self.start_pos, self.walls = maze_layout(walls, grid, cell_px)
         self.action_space = spaces.Box(low=-5.0, high=5.0, shape=(2,), dtype=np.float32)
         self.observation_space = spaces.Box(low=0, high=max(self.width, self.height), shape=(2,), dtype=np.float32)
 
-        pygame.init()
-        self.screen = pygame.display.set_mode((self.width, self.height))
-        self.clock = pygame.time.Clock()
+        # The window is only opened by the first render(mode='human'), so headless
+        # training and subprocess workers never touch the display
+        self.screen = None
+        self.clock = None
+        self.background = None  # Cached walls for rgb_array frames
 
         # Agent settings
         self.agent_radius = 10
-        self.agent_pos = np.array([self.width / 4, self.height / 2])
+        self.agent_pos = self.start_pos.copy()
         self.agent_speed = 5.0
 
-        # Walls (represented as rectangles)
-        self.walls = [
-            pygame.Rect(100, 50, 150, 10),
-            pygame.Rect(100, 250, 200, 10),
-            pygame.Rect(100, 50, 10, 200),
-            pygame.Rect(290, 60, 10, 190)
-            # Add more walls as needed
-        ]
+        # Walls are (x, y, w, h) rectangles
+        self.wall_index = WallIndex(self.walls, cell_size=max(32, 2 * self.agent_radius))
 
     def step(self, action):
         new_pos = self.agent_pos + action * self.agent_speed
@@ -44,10 +45,17 @@ class ContinuousMazeEnv(gym.Env):
         return observation, reward, done, {}
 
     def reset(self):
-        self.agent_pos = np.array([self.width / 4, self.height / 2])
+        self.agent_pos = self.start_pos.copy()
         return self.agent_pos
 
     def render(self, mode='human'):
+        if mode == 'rgb_array':
+            return self.render_array()
+        if self.screen is None:
+            pygame.init()
+            self.screen = pygame.display.set_mode((self.width, self.height))
+            self.clock = pygame.time.Clock()
+
         self.screen.fill((0, 0, 0))
         # Draw walls
         for wall in self.walls:
@@ -58,22 +66,41 @@ class ContinuousMazeEnv(gym.Env):
         pygame.display.flip()
         self.clock.tick(60)
 
+    def render_array(self):
+        """Current frame as a (height, width, 3) uint8 array, drawn in NumPy without pygame"""
+        if self.background is None:
+            self.background = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            for x, y, w, h in self.walls:
+                self.background[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = 255
+
+        frame = self.background.copy()
+        x, y = self.agent_pos.astype(int)
+        r = self.agent_radius
+        y0, y1 = max(y - r, 0), min(y + r + 1, self.height)
+        x0, x1 = max(x - r, 0), min(x + r + 1, self.width)
+        rows, cols = np.ogrid[y0:y1, x0:x1]
+        frame[y0:y1, x0:x1][(cols - x) ** 2 + (rows - y) ** 2 <= r * r] = (255, 0, 0)
+        return frame
+
     def check_collision(self, new_pos):
-        agent_rect = pygame.Rect(new_pos[0] - self.agent_radius, new_pos[1] - self.agent_radius,
-                                 self.agent_radius * 2, self.agent_radius * 2)
-        return any(agent_rect.colliderect(wall) for wall in self.walls)
+        # Same answer as testing pygame.Rect(new_pos - radius, 2 * radius) against every wall,
+        # but only the walls near new_pos are looked at
+        return self.wall_index.collide(new_pos, self.agent_radius)
 
     def close(self):
-        pygame.quit()
+        if self.screen is not None:
+            pygame.quit()
+            self.screen = None
 
 # Testing the environment
-env = ContinuousMazeEnv()
-
-for _ in range(5000):
-    env.render()
-    action = env.action_space.sample()  # Replace this with your algorithm's action
-    env.step(action)
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            env.close()
-            exit()
+if __name__ == "__main__":
+    env = ContinuousMazeEnv()
+
+    for _ in range(5000):
+        env.render()
+        action = env.action_space.sample()  # Replace this with your algorithm's action
+        env.step(action)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                env.close()
+                exit()
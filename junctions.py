@@ -0,0 +1,173 @@
+import numpy as np
+from mazemodel import usable_teleport
+
+
+class JunctionGraph:
+    """Maze collapsed to a weighted graph of junctions.
+
+    Every walkable cell that isn't a plain corridor cell (two open neighbours) becomes a
+    node, plus the start and goal. Corridors between nodes become edges weighted by their
+    length. Dead ends are pruned and nodes left with two neighbours are merged away, so
+    only the junctions that matter for reaching the goal remain. Stepping onto the
+    teleport cell ends an edge at the goal, like MazeSolver.step. A teleport outside the
+    maze or on a wall is ignored, as usable_teleport decides for every solver.
+    """
+    def __init__(self, maze, start, goal, teleport=None):
+        maze = np.asarray(maze)
+        self.shape = maze.shape
+        self.n_cols = maze.shape[1]
+        self.walkable = (maze != 1).ravel()
+        teleport = usable_teleport(maze, teleport)
+        self.start = self.to_cell(*start)
+        self.goal = self.to_cell(*goal)
+        self.teleport = self.to_cell(*teleport) if teleport is not None else -1
+
+        walk = maze != 1
+        padded = np.pad(walk, 1)
+        degree = (padded[:-2, 1:-1].astype(np.int8) + padded[2:, 1:-1]
+                  + padded[1:-1, :-2] + padded[1:-1, 2:])
+        is_node = walk & (degree != 2)
+        is_node.flat[[self.start, self.goal]] = True
+        stop = is_node.ravel().copy()
+        if teleport is not None:
+            is_node[teleport] = False
+            stop[self.teleport] = True
+
+        out = self.trace(np.flatnonzero(is_node.ravel()), stop)
+        self.compress(out)
+        self.finalize(out)
+
+    def to_cell(self, row, col):
+        return row * self.n_cols + col
+
+    def neighbors(self, cell):
+        row, col = divmod(cell, self.n_cols)
+        if row > 0 and self.walkable[cell - self.n_cols]:
+            yield cell - self.n_cols
+        if row < self.shape[0] - 1 and self.walkable[cell + self.n_cols]:
+            yield cell + self.n_cols
+        if col > 0 and self.walkable[cell - 1]:
+            yield cell - 1
+        if col < self.n_cols - 1 and self.walkable[cell + 1]:
+            yield cell + 1
+
+    def trace(self, nodes, stop):
+        """Follow every corridor out of every node. out[u][(v, teleport)] holds the cells of
+        the shortest corridor from u to v, excluding u and including v. An edge into the
+        goal through the teleport earns a different reward than a walk onto the goal, so
+        the two are kept as separate edges and the discount decides between them"""
+        out = {int(u): {} for u in nodes}
+        for u in out:
+            if u == self.goal:
+                continue  # Terminal, nothing leaves the goal
+            for first in self.neighbors(u):
+                prev, cur, cells = u, first, [first]
+                while not stop[cur]:
+                    nxt = next(n for n in self.neighbors(cur) if n != prev)
+                    prev, cur = cur, nxt
+                    cells.append(cur)
+
+                via_teleport = cur == self.teleport
+                if via_teleport:
+                    cells[-1] = cur = self.goal
+                if cur == u:
+                    continue
+                # Among corridors with the same end, the shorter one never earns less
+                edge = (cur, via_teleport)
+                if edge not in out[u] or len(cells) < len(out[u][edge]):
+                    out[u][edge] = np.array(cells, dtype=np.int64)
+        return out
+
+    def compress(self, out):
+        """Prune dead ends and merge nodes that only connect two neighbours, in place"""
+        into = {u: set() for u in out}
+        for u, edges in out.items():
+            for v, _ in edges:
+                into[v].add(u)
+
+        def targets(n):
+            return {v for v, _ in out[n]}
+
+        def remove(n):
+            # n is never the goal, so no edge into it goes through the teleport
+            for a in into.pop(n):
+                del out[a][(n, False)]
+            for b, _ in out.pop(n):
+                into[b].discard(n)
+
+        candidates = set(out) - {self.start, self.goal}
+        while candidates:
+            n = candidates.pop()
+            if n not in out:
+                continue
+            linked = targets(n) | into[n]
+            if len(linked) <= 1:
+                remove(n)
+                candidates |= linked
+            elif len(linked) == 2 and targets(n) == into[n] == linked:
+                # Neither neighbour is the goal, which has no edges out, so no teleport edges here
+                a, b = linked
+                ab = np.concatenate((out[a][(n, False)], out[n][(b, False)]))
+                ba = np.concatenate((out[b][(n, False)], out[n][(a, False)]))
+                remove(n)
+                for u, v, cells in ((a, b, ab), (b, a, ba)):
+                    if (v, False) not in out[u] or len(cells) < len(out[u][(v, False)]):
+                        out[u][(v, False)] = cells
+                        into[v].add(u)
+                candidates |= linked
+            candidates -= {self.start, self.goal}
+
+    def finalize(self, out):
+        """Flatten the graph into per-node action slots and one (offsets, cells) edge store"""
+        self.nodes = np.array(sorted(out), dtype=np.int64)
+        self.node_index = {int(cell): i for i, cell in enumerate(self.nodes)}
+        self.n_nodes = len(self.nodes)
+        self.n_actions = max([len(edges) for edges in out.values()] + [1])
+
+        self.edge_target = np.full((self.n_nodes, self.n_actions), -1, dtype=np.int64)
+        self.edge_id = np.full((self.n_nodes, self.n_actions), -1, dtype=np.int64)
+        self.edge_teleport = []
+        lengths, blocks = [], []
+        for i, u in enumerate(self.nodes):
+            for slot, ((v, via_teleport), cells) in enumerate(out[int(u)].items()):
+                self.edge_target[i, slot] = self.node_index[v]
+                self.edge_id[i, slot] = len(blocks)
+                self.edge_teleport.append(via_teleport)
+                lengths.append(len(cells))
+                blocks.append(cells)
+
+        self.edge_length = np.array(lengths, dtype=np.int64)
+        self.edge_offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+        np.cumsum(self.edge_length, out=self.edge_offsets[1:])
+        self.edge_cells = np.concatenate(blocks) if blocks else np.empty(0, dtype=np.int64)
+
+    def tables(self, discount_factor):
+        """next_state, reward, done and per-action discount over nodes. Walking an edge of
+        length L earns the discounted sum of MazeSolver's per-step rewards along it and
+        discounts the next node by discount_factor ** L. Missing actions act like a wall"""
+        valid = self.edge_id >= 0
+        next_state = np.where(valid, self.edge_target, np.arange(self.n_nodes)[:, None])
+        reward = np.full(next_state.shape, -1.0)
+        discount = np.full(next_state.shape, float(discount_factor))
+        goal_node = self.node_index[self.goal]
+
+        for i, slot in zip(*np.nonzero(valid)):
+            edge = self.edge_id[i, slot]
+            length = self.edge_length[edge]
+            last = -0.01
+            if self.edge_target[i, slot] == goal_node:
+                last = 5.0 if self.edge_teleport[edge] else 10.0
+            powers = discount_factor ** np.arange(length)
+            reward[i, slot] = -0.01 * powers[:-1].sum() + powers[-1] * last
+            discount[i, slot] = discount_factor ** length
+
+        done = valid & (next_state == goal_node)
+        return next_state, reward, done, discount
+
+    def expand(self, node_path, actions):
+        """Turn a walk over nodes (with the action slot taken at each) back into (row, col) cells"""
+        cells = [self.nodes[node_path[0]]]
+        for node, action in zip(node_path, actions):
+            edge = self.edge_id[node, action]
+            cells.extend(self.edge_cells[self.edge_offsets[edge]:self.edge_offsets[edge + 1]])
+        return [divmod(int(cell), self.n_cols) for cell in cells]
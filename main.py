@@ -3,6 +3,7 @@ import sys
 import random
 import numpy as np
 from mazegen import makeMaze
+from mazeview import MazeRenderer, Viewport
 from qlearning2 import MazeSolver
 import time
 
@@ -41,7 +42,12 @@ maze = [[1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
 [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]]
 start_p = (1, 1)
 goal_p = (23, 23)
-solver = MazeSolver(np.array(maze), start_p, goal_p)
+if len(sys.argv) > 1:
+    # python main.py path/to/file.maze
+    solver = MazeSolver.from_file(sys.argv[1], cache_dir=".qcache")
+    maze = solver.maze
+else:
+    solver = MazeSolver(np.array(maze), start_p, goal_p, cache_dir=".qcache")
 path = solver.solve()
 cell_size = 25  # Size of each cell in the maze
 
@@ -55,6 +61,13 @@ pygame.init()
 win = pygame.display.set_mode((625, 625)) 
 pygame.display.set_caption("Moving rectangle") 
 
+# Only the cells in view are drawn, and only repainted when the camera moves. Otherwise
+# each frame just redraws the player's old and new rects. Wheel or +/- zoom, arrow keys
+# or dragging pan, f follows the player again
+viewport = Viewport(maze, win.get_size(), cell_size)
+viewport.follow(y / cell_size, x / cell_size, smoothing=1)
+renderer = MazeRenderer(win, viewport.frame()[0])
+
 run = True
 while run: 
     pygame.time.delay(10) 
@@ -62,6 +75,9 @@ while run:
     for event in pygame.event.get(): 
         if event.type == pygame.QUIT: 
             run = False
+        if event.type == pygame.VIDEOEXPOSE:
+            renderer.redraw()
+        viewport.handle_event(event)
 
     keys = pygame.key.get_pressed() 
     
@@ -72,21 +88,17 @@ while run:
         # Add a small delay to visualize the movement
         time.sleep(0.1) # Adjust the delay as needed for smoother movement
 
-    
-    win.fill((0, 0, 0))  # Clear screen
 
-    # Draw the maze
-    for my in range(len(maze)):
-        for mx in range(len(maze[my])):
-            if maze[my][mx] == 1:
-                pygame.draw.rect(win, (0, 0, 255), (mx * cell_size, my * cell_size, cell_size, cell_size))
-            
-            if maze[my][mx] == 2:
-                pygame.draw.rect(win, (0, 255, 0), (mx * cell_size, my * cell_size, cell_size, cell_size))
+    viewport.follow(y / cell_size, x / cell_size)
+    background, moved = viewport.frame()
+    if moved:
+        renderer.background = background
+        renderer.redraw()
+    renderer.clear()
 
     # Draw the player
-    pygame.draw.rect(win, (255, 0, 0), (x, y, width, height)) 
+    renderer.rect((255, 0, 0), viewport.cell_rect(y / cell_size, x / cell_size))
 
-    pygame.display.update() 
+    renderer.flip()
 
 pygame.quit()
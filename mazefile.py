@@ -0,0 +1,112 @@
+import struct
+import numpy as np
+
+# Bit-packed maze file:
+#   header   magic, version, rows, cols, start, goal, teleport (-1, -1 if none), mark count
+#   marks    (row, col, value) for every cell that isn't a plain 0/1, e.g. the 2 goal marker
+#   padding  up to an 8 byte boundary
+#   data     one bit per cell (1 = wall), each row packed to ceil(cols / 8) bytes
+MAGIC = b"MAZE"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxqqqqqqqqI")
+MARK = struct.Struct("<qqB")
+NO_CELL = (-1, -1)
+
+
+def _data_offset(n_marks):
+    size = HEADER.size + n_marks * MARK.size
+    return (size + 7) // 8 * 8
+
+
+class MazeWriter:
+    """Writes a maze file row by row, so the full grid never has to be in memory"""
+    def __init__(self, path, rows, cols, start=(1, 1), goal=None, teleport=None, marks=()):
+        self.rows = rows
+        self.cols = cols
+        self.rows_written = 0
+        goal = goal if goal is not None else (rows - 2, cols - 2)
+        teleport = teleport if teleport is not None else NO_CELL
+        marks = [(int(r), int(c), int(v)) for r, c, v in marks]
+
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, rows, cols, *start, *goal, *teleport, len(marks)))
+        for mark in marks:
+            self.file.write(MARK.pack(*mark))
+        self.file.write(b"\0" * (_data_offset(len(marks)) - self.file.tell()))
+
+    def write_rows(self, rows):
+        """Append one row or a block of rows of the 0/1 grid"""
+        rows = np.atleast_2d(np.asarray(rows))
+        if rows.shape[1] != self.cols:
+            raise ValueError(f"expected rows of length {self.cols}, got {rows.shape[1]}")
+        self.file.write(np.packbits(rows == 1, axis=1).tobytes())
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        self.file.close()
+        if self.rows_written != self.rows:
+            raise ValueError(f"maze file has {self.rows_written} rows, header says {self.rows}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+class MazeFile:
+    """A maze file opened through np.memmap, rows are only paged in when they are read"""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = HEADER.unpack(f.read(HEADER.size))
+            magic, version, rows, cols, *cells, n_marks = header
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a maze file")
+            if version != VERSION:
+                raise ValueError(f"unsupported maze file version {version}")
+            marks = [MARK.unpack(f.read(MARK.size)) for _ in range(n_marks)]
+
+        self.path = path
+        self.shape = (rows, cols)
+        self.start = tuple(cells[0:2])
+        self.goal = tuple(cells[2:4])
+        self.teleport = tuple(cells[4:6]) if tuple(cells[4:6]) != NO_CELL else None
+        self.marks = marks
+        self.bits = np.memmap(path, dtype=np.uint8, mode="r", offset=_data_offset(n_marks),
+                              shape=(rows, (cols + 7) // 8))
+
+    def __getitem__(self, cell):
+        row, col = cell
+        for r, c, value in self.marks:
+            if (r, c) == (row, col):
+                return value
+        return (int(self.bits[row, col >> 3]) >> (7 - (col & 7))) & 1
+
+    def window(self, row0, row1, col0, col1):
+        """Unpack only the cells in [row0, row1) x [col0, col1) as a uint8 array"""
+        byte0, byte1 = col0 >> 3, (col1 + 7) >> 3
+        cells = np.unpackbits(self.bits[row0:row1, byte0:byte1], axis=1)
+        cells = cells[:, col0 - byte0 * 8:col1 - byte0 * 8]
+        for r, c, value in self.marks:
+            if row0 <= r < row1 and col0 <= c < col1:
+                cells[r - row0, c - col0] = value
+        return cells
+
+    def grid(self):
+        """Unpack the whole maze into the 0/1/2 uint8 array MazeSolver and the front ends use"""
+        return self.window(0, self.shape[0], 0, self.shape[1])
+
+
+def save_maze(path, maze, start=(1, 1), goal=None, teleport=None):
+    """Write a 0/1 maze (list of lists or array) to path. Cells with other values are kept as marks"""
+    maze = np.asarray(maze)
+    marks = [(r, c, maze[r, c]) for r, c in zip(*np.nonzero(maze > 1))]
+    with MazeWriter(path, *maze.shape, start=start, goal=goal, teleport=teleport, marks=marks) as writer:
+        writer.write_rows(maze)
+
+
+def load_maze(path):
+    return MazeFile(path)
@@ -1,5 +1,14 @@
 import random
+import numpy as np
+from mazefile import MazeWriter
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, carveWalls falls back to plain Python
+    njit = None
+
+# Wall bits of the array-backed generator, same order as Cell.walls
+LEFT, RIGHT, UP, DOWN = 1, 2, 4, 8
 
 class Cell:
     """Cell class that defines each walkable Cell on the grid"""
@@ -111,4 +120,213 @@ def makeMaze(size: int):
         else:
             break
     
-    return displayMaze(grid)
\ No newline at end of file
+    return displayMaze(grid)
+
+
+def _carve(walls, visited, stack, rand, size: int):
+    """Recursion-free backtracker over flat cell indices, works on arrays or memoryviews"""
+    n = size * size
+    children = [0, 0, 0, 0]
+    top = 0
+    r = 0
+    current = 0
+    visited[0] = 1
+
+    while True:
+        x = current % size
+        k = 0
+        if x > 0 and not visited[current - 1]:
+            children[k] = current - 1
+            k += 1
+        if x < size - 1 and not visited[current + 1]:
+            children[k] = current + 1
+            k += 1
+        if current >= size and not visited[current - size]:
+            children[k] = current - size
+            k += 1
+        if current + size < n and not visited[current + size]:
+            children[k] = current + size
+            k += 1
+
+        if k:
+            choice = children[int(rand[r] * k)]
+            r += 1
+
+            d = choice - current
+            if d == -1:
+                walls[current] &= ~LEFT
+                walls[choice] &= ~RIGHT
+            elif d == 1:
+                walls[current] &= ~RIGHT
+                walls[choice] &= ~LEFT
+            elif d < 0:
+                walls[current] &= ~UP
+                walls[choice] &= ~DOWN
+            else:
+                walls[current] &= ~DOWN
+                walls[choice] &= ~UP
+
+            visited[choice] = 1
+            stack[top] = current
+            top += 1
+            current = choice
+        elif top:
+            top -= 1
+            current = stack[top]
+        else:
+            return walls
+
+
+_carveJit = njit(cache=True)(_carve) if njit else None
+
+
+def carveWalls(size: int, seed=None) -> np.ndarray:
+    """Run the backtracker and return a (size, size) uint8 array of wall bitmasks"""
+    rng = np.random.default_rng(seed)
+    n = size * size
+    walls = np.full(n, LEFT | RIGHT | UP | DOWN, dtype=np.uint8)
+    visited = np.zeros(n, dtype=np.uint8)
+    stack = np.empty(n, dtype=np.int64)
+
+    # One draw per carved cell, generated up front so both paths see the same stream
+    rand = rng.random(n, dtype=np.float32)
+
+    if _carveJit is not None:
+        _carveJit(walls, visited, stack, rand, size)
+    else:
+        _carve(walls.data, visited.data, stack.data, rand.data, size)
+    return walls.reshape(size, size)
+
+
+def wallsToGrid(walls: np.ndarray) -> np.ndarray:
+    """Vectorized drawWalls/drawBorder: turn wall bitmasks into the 0/1 grid of displayMaze"""
+    size = walls.shape[0]
+    length = size * 2 + 1
+    binGrid = np.zeros((length, length), dtype=np.uint8)
+    binGrid[::2, ::2] = 1
+
+    binGrid[1::2, 0:-1:2] |= (walls & LEFT) != 0
+    binGrid[1::2, 2::2] |= (walls & RIGHT) != 0
+    binGrid[0:-1:2, 1::2] |= (walls & UP) != 0
+    binGrid[2::2, 1::2] |= (walls & DOWN) != 0
+
+    binGrid[[0, -1], :] = 1
+    binGrid[:, [0, -1]] = 1
+    return binGrid
+
+
+def makeMazeArray(size: int, seed=None) -> np.ndarray:
+    """Array-backed makeMaze: same 0/1 grid layout as displayMaze, as a uint8 NumPy array.
+    seed can be an int, None or a np.random.Generator"""
+    return wallsToGrid(carveWalls(size, seed))
+
+
+def _ellerRow(sets, joinRand, downRand, pickRand, lastRow, parent, count, pick, label, right, down):
+    """One step of Eller's algorithm: join cells of a row, choose the passages down
+    and relabel sets for the next row. All arrays are O(width)"""
+    w = sets.shape[0]
+    for i in range(w):
+        parent[i] = i
+
+    # Horizontal passages, merging sets with a small union-find
+    for x in range(w - 1):
+        a = sets[x]
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        b = sets[x + 1]
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a != b and (lastRow or joinRand[x] < 0.5):
+            parent[b] = a
+            right[x] = 1
+        else:
+            right[x] = 0
+
+    for x in range(w):
+        a = sets[x]
+        while parent[a] != a:
+            a = parent[a]
+        sets[x] = a
+
+    if lastRow:
+        for x in range(w):
+            down[x] = 0
+        return sets
+
+    # Vertical passages, every set keeps at least one cell going down
+    for i in range(w):
+        count[i] = 0
+        pick[i] = 0
+    for x in range(w):
+        s = sets[x]
+        count[s] += 1
+        if pickRand[x] * count[s] < 1:
+            pick[s] = x
+        down[x] = 1 if downRand[x] < 0.5 else 0
+    for x in range(w):
+        if down[x]:
+            count[sets[x]] = 0
+    for x in range(w):
+        s = sets[x]
+        if count[s]:
+            down[pick[s]] = 1
+            count[s] = 0
+
+    # Cells that don't carry a set down start a new one, then relabel to 0..w-1
+    for i in range(2 * w):
+        label[i] = -1
+    nextLabel = 0
+    for x in range(w):
+        s = sets[x] if down[x] else w + x
+        if label[s] == -1:
+            label[s] = nextLabel
+            nextLabel += 1
+        sets[x] = label[s]
+    return sets
+
+
+_ellerRowJit = njit(cache=True)(_ellerRow) if njit else None
+
+
+def streamMaze(width: int, height: int, seed=None):
+    """Generate a width x height maze with Eller's algorithm and yield the 0/1 grid
+    row by row (2*height+1 rows of length 2*width+1) using O(width) memory"""
+    rng = np.random.default_rng(seed)
+    ellerRow = _ellerRowJit if _ellerRowJit is not None else _ellerRow
+    length = width * 2 + 1
+
+    sets = np.arange(width, dtype=np.int64)
+    parent = np.empty(width, dtype=np.int64)
+    count = np.empty(width, dtype=np.int64)
+    pick = np.empty(width, dtype=np.int64)
+    label = np.empty(2 * width, dtype=np.int64)
+    right = np.empty(max(width - 1, 0), dtype=np.uint8)
+    down = np.empty(width, dtype=np.uint8)
+
+    yield np.ones(length, dtype=np.uint8)
+
+    for y in range(height):
+        lastRow = y == height - 1
+        ellerRow(sets, rng.random(width - 1), rng.random(width), rng.random(width),
+                 lastRow, parent, count, pick, label, right, down)
+
+        cellRow = np.zeros(length, dtype=np.uint8)
+        cellRow[0] = cellRow[-1] = 1
+        cellRow[2:-1:2] = 1 - right
+        yield cellRow
+
+        wallRow = np.ones(length, dtype=np.uint8)
+        wallRow[1::2] = 1 - down
+        if lastRow:
+            wallRow[:] = 1
+        yield wallRow
+
+
+def writeMazeStream(path: str, width: int, height: int, seed=None):
+    """Stream a maze straight into a maze file without holding the grid in memory"""
+    rows, cols = height * 2 + 1, width * 2 + 1
+    with MazeWriter(path, rows, cols) as writer:
+        for row in streamMaze(width, height, seed):
+            writer.write_rows(row)
\ No newline at end of file
@@ -0,0 +1,87 @@
+import numpy as np
+
+UP_DOWN_LEFT_RIGHT = ((-1, 0), (1, 0), (0, -1), (0, 1))  # MazeSolver's action order
+
+
+def usable_teleport(grid, teleport):
+    """teleport as a (row, col) tuple, or None when no move can ever land on it because it
+    is outside the grid or on a wall. Every solver and search applies this one rule"""
+    if teleport is None:
+        return None
+    row, col = (int(i) for i in teleport)
+    n_rows, n_cols = np.shape(grid)
+    if 0 <= row < n_rows and 0 <= col < n_cols and grid[row][col] != 1:
+        return (row, col)
+    return None
+
+
+class MazeModel:
+    """Compact maze shared by the solvers: a uint8 grid (0 open, 1 wall, other values are
+    markers like the 2 goal marker), start/goal metadata and move tables built on demand.
+
+    move_table(cells) gives, for each of those flat cells and each action, the flat cell the
+    action leads to (clipped at the border) and whether that cell is inside the maze and not
+    a wall. Only the rows a caller asks for are built, so a solver that keeps walkable cells
+    only never pays for the walls.
+    """
+    def __init__(self, grid, start=None, goal=None, moves=UP_DOWN_LEFT_RIGHT):
+        self.grid = np.ascontiguousarray(grid, dtype=np.uint8)
+        self.n_rows, self.n_cols = self.grid.shape
+        self.n_cells = self.grid.size
+        self.start = tuple(start) if start is not None else None
+        self.goal = tuple(goal) if goal is not None else None
+        self.moves = tuple(tuple(move) for move in moves)
+        self.walkable = self.grid != 1
+        # Smallest index type that holds every flat cell
+        self.index_dtype = np.int32 if self.n_cells <= np.iinfo(np.int32).max else np.int64
+
+    @classmethod
+    def parse(cls, maze, start=None, goal=None, moves=UP_DOWN_LEFT_RIGHT):
+        """Build a model from a 0/1/2 grid (list of lists or array) or a char grid with
+        '#' walls, 'S' start and 'G' goal. Explicit start/goal override the ones in the grid"""
+        if isinstance(maze, MazeModel):
+            return cls(maze.grid, start or maze.start, goal or maze.goal, moves)
+
+        cells = np.asarray(maze)
+        if cells.dtype.kind not in "OUS":
+            return cls(cells, start, goal, moves)
+
+        chars = cells.astype(str)
+        grid = (chars == '#').astype(np.uint8)
+        if start is None and (chars == 'S').any():
+            start = tuple(int(i) for i in np.argwhere(chars == 'S')[0])
+        if goal is None and (chars == 'G').any():
+            goal = tuple(int(i) for i in np.argwhere(chars == 'G')[0])
+        return cls(grid, start, goal, moves)
+
+    def to_cell(self, row, col):
+        return row * self.n_cols + col
+
+    def to_row_col(self, cell):
+        return divmod(int(cell), self.n_cols)
+
+    def is_walkable(self, row, col):
+        return 0 <= row < self.n_rows and 0 <= col < self.n_cols and bool(self.walkable[row, col])
+
+    def move_table(self, cells=None):
+        """(next_cell, valid), both (len(cells), n_moves), for the given flat cells or every
+        cell. One action at a time, so no temporaries larger than a column are built"""
+        if cells is None:
+            cells = np.arange(self.n_cells, dtype=self.index_dtype)
+        cells = np.asarray(cells, dtype=self.index_dtype)
+        rows, cols = np.divmod(cells, self.index_dtype(self.n_cols))
+        walkable = self.walkable.ravel()
+
+        next_cell = np.empty((len(cells), len(self.moves)), dtype=self.index_dtype)
+        valid = np.empty(next_cell.shape, dtype=bool)
+        for action, (d_row, d_col) in enumerate(self.moves):
+            to_rows = rows + d_row
+            to_cols = cols + d_col
+            valid[:, action] = (to_rows >= 0) & (to_rows < self.n_rows) & (to_cols >= 0) & (to_cols < self.n_cols)
+            np.clip(to_rows, 0, self.n_rows - 1, out=to_rows)
+            np.clip(to_cols, 0, self.n_cols - 1, out=to_cols)
+            to_rows *= self.n_cols
+            to_rows += to_cols
+            next_cell[:, action] = to_rows
+            valid[:, action] &= walkable[to_rows]
+        return next_cell, valid
@@ -0,0 +1,247 @@
+import numpy as np
+import pygame
+
+MAZE_COLORS = {1: (0, 0, 255), 2: (0, 255, 0)}  # Walls blue, goal marker green
+
+
+class MazeRenderer:
+    """Draws moving things over a cached background Surface and only pushes the changed
+    areas to the display.
+
+    Every frame: clear() puts the background back under whatever the last frame drew,
+    rect()/blit() draw this frame's sprites, and flip() updates just those rects with
+    display.update, so frame time depends on the sprites and not on the maze size.
+    stamp() draws into the background itself, for marks that should stay.
+    """
+    def __init__(self, win, background):
+        self.win = win
+        self.background = background
+        self.drawn = []
+        self.dirty = []
+        self.redraw()
+
+    def redraw(self):
+        """Full repaint on the next flip, for the first frame, after the window was
+        covered or after the background changed"""
+        self.win.fill((0, 0, 0))
+        self.win.blit(self.background, (0, 0))
+        self.drawn = []
+        self.dirty = [self.win.get_rect()]
+
+    def clear(self):
+        for rect in self.drawn:
+            self.win.blit(self.background, rect, rect)
+        self.dirty.extend(self.drawn)
+        self.drawn = []
+
+    def rect(self, color, rect):
+        rect = pygame.draw.rect(self.win, color, rect)
+        self.drawn.append(rect)
+        self.dirty.append(rect)
+
+    def blit(self, surface, pos):
+        rect = self.win.blit(surface, pos)
+        self.drawn.append(rect)
+        self.dirty.append(rect)
+
+    def stamp(self, color, rect):
+        pygame.draw.rect(self.background, color, rect)
+        self.dirty.append(self.win.blit(self.background, rect, rect))
+
+    def flip(self):
+        pygame.display.update(self.dirty)
+        self.dirty = []
+
+
+class Viewport:
+    """Camera over a maze that can be far bigger than the window.
+
+    maze is a 0/1/2 grid or a MazeFile, which is only read through window() for the
+    cells in view. scale is screen pixels per cell, a whole number, or a power of two
+    when zoomed out below one pixel per cell. The maze then comes from a pyramid of
+    2x2-averaged wall densities, built once per level on first use and drawn as shades
+    between the background and the wall colour. Each frame blits one cached Surface of
+    the visible cells, and that Surface is only rebuilt when the view crosses a cell, so
+    frame time depends on the window size and not on the maze.
+    """
+    def __init__(self, maze, size=(625, 625), scale=25, colors=MAZE_COLORS, background=(0, 0, 0)):
+        self.maze = maze if hasattr(maze, "window") else np.asarray(maze)
+        self.shape = tuple(self.maze.shape)
+        self.size = size
+        self.scale = scale
+        self.center = [self.shape[0] / 2, self.shape[1] / 2]  # (row, col) in cells
+        self.following = True
+        self.min_scale = 2.0 ** -int(np.ceil(np.log2(max(1, max(self.shape) / min(size)))))
+        self.max_scale = 64
+
+        self.palette = np.zeros((256, 3), dtype=np.uint8)
+        self.palette[:] = background
+        for value, color in colors.items():
+            self.palette[value] = color
+        shades = np.linspace(0, 1, 256)[:, None]
+        self.shades = (np.array(background) * (1 - shades) + np.array(colors[1]) * shades).astype(np.uint8)
+
+        self.levels = {}
+        self.cached = None
+        self.surface = None
+        self.framed = None
+        self.frame_surface = None
+
+    def cells(self, row0, row1, col0, col1):
+        if hasattr(self.maze, "window"):
+            return self.maze.window(row0, row1, col0, col1)
+        return self.maze[row0:row1, col0:col1]
+
+    def level(self, k):
+        """Wall density (0-255) of every 2**k x 2**k block of cells"""
+        if k not in self.levels:
+            if k == 1:
+                # Straight from the maze in bands of rows, a MazeFile is never unpacked at once
+                band = 2048
+                rows = []
+                for row0 in range(0, self.shape[0], band):
+                    walls = (self.cells(row0, min(row0 + band, self.shape[0]), 0, self.shape[1]) == 1)
+                    rows.append(self.downsample(walls.astype(np.uint16) * 255))
+                self.levels[1] = np.concatenate(rows)
+            else:
+                self.levels[k] = self.downsample(self.level(k - 1).astype(np.uint16))
+        return self.levels[k]
+
+    @staticmethod
+    def downsample(density):
+        rows, cols = density.shape
+        density = np.pad(density, ((0, rows % 2), (0, cols % 2)))
+        blocks = density[0::2, 0::2] + density[1::2, 0::2] + density[0::2, 1::2] + density[1::2, 1::2]
+        return (blocks // 4).astype(np.uint8)
+
+    def view(self):
+        """(level, pixels per level cell, top-left row and col as floats in level cells)"""
+        k = max(0, int(round(-np.log2(self.scale))))
+        px = int(self.scale * 2 ** k)
+        top = self.center[0] / 2 ** k - self.size[1] / (2 * px)
+        left = self.center[1] / 2 ** k - self.size[0] / (2 * px)
+        return k, px, top, left
+
+    def render(self):
+        """Surface of the visible level cells and where to blit it"""
+        k, px, top, left = self.view()
+        row0, col0 = int(np.floor(top)), int(np.floor(left))
+        key = (k, px, row0, col0)
+        if key != self.cached:
+            n_rows, n_cols = self.size[1] // px + 2, self.size[0] // px + 2
+            rgb = np.empty((n_rows, n_cols, 3), dtype=np.uint8)
+            rgb[:] = self.palette[0]
+            shape = self.shape if k == 0 else self.level(k).shape
+            r0, r1 = max(row0, 0), min(row0 + n_rows, shape[0])
+            c0, c1 = max(col0, 0), min(col0 + n_cols, shape[1])
+            if r0 < r1 and c0 < c1:
+                if k == 0:
+                    block = self.palette[self.cells(r0, r1, c0, c1)]
+                else:
+                    block = self.shades[self.level(k)[r0:r1, c0:c1]]
+                rgb[r0 - row0:r1 - row0, c0 - col0:c1 - col0] = block
+            if px > 1:
+                rgb = rgb.repeat(px, axis=0).repeat(px, axis=1)
+            self.surface = pygame.surfarray.make_surface(rgb.transpose(1, 0, 2))
+            self.cached = key
+        return self.surface, (int(round((col0 - left) * px)), int(round((row0 - top) * px)))
+
+    def frame(self):
+        """The maze under the camera as a window-sized Surface, usable as a MazeRenderer
+        background, and whether it changed since the last call"""
+        surface, pos = self.render()
+        if (self.cached, pos) == self.framed:
+            return self.frame_surface, False
+        if self.frame_surface is None:
+            self.frame_surface = pygame.Surface(self.size)
+        self.frame_surface.fill(self.palette[0])
+        self.frame_surface.blit(surface, pos)
+        self.framed = (self.cached, pos)
+        return self.frame_surface, True
+
+    def draw(self, win):
+        win.blit(self.frame()[0], (0, 0))
+
+    def to_screen(self, row, col):
+        """Window pixel of the top-left corner of a cell"""
+        return (int(round((col - self.center[1]) * self.scale + self.size[0] / 2)),
+                int(round((row - self.center[0]) * self.scale + self.size[1] / 2)))
+
+    def cell_rect(self, row, col, min_size=3):
+        """Window rect of a cell, at least min_size pixels so markers stay visible zoomed out"""
+        x, y = self.to_screen(row, col)
+        side = max(int(self.scale), min_size)
+        return pygame.Rect(x, y, side, side)
+
+    def clamp(self):
+        """Keep the view inside the maze, or centred on it when it fits in the window"""
+        for axis, pixels in ((0, self.size[1]), (1, self.size[0])):
+            half, n = pixels / (2 * self.scale), self.shape[axis]
+            self.center[axis] = n / 2 if n <= 2 * half else min(max(self.center[axis], half), n - half)
+
+    def follow(self, row, col, smoothing=0.2):
+        """Move the camera part of the way towards a cell, call once per frame"""
+        if self.following:
+            self.center[0] += (row + 0.5 - self.center[0]) * smoothing
+            self.center[1] += (col + 0.5 - self.center[1]) * smoothing
+            self.clamp()
+
+    def zoom(self, factor):
+        scale = self.scale * factor
+        scale = max(round(scale), 1) if scale >= 1 else 2.0 ** np.floor(np.log2(scale))
+        self.scale = min(max(scale, self.min_scale), self.max_scale)
+        self.clamp()
+
+    def pan(self, dx, dy):
+        """Move the view by window pixels, which stops following"""
+        self.following = False
+        self.center[0] += dy / self.scale
+        self.center[1] += dx / self.scale
+        self.clamp()
+
+    def handle_event(self, event):
+        """Mouse wheel or +/- zoom, arrow keys or dragging pan, f goes back to following"""
+        if event.type == pygame.MOUSEWHEEL:
+            self.zoom(2.0 if event.y > 0 else 0.5)
+        elif event.type == pygame.MOUSEMOTION and event.buttons[0]:
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.KEYDOWN:
+            step = min(self.size) / 4
+            if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom(2.0)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom(0.5)
+            elif event.key == pygame.K_LEFT:
+                self.pan(-step, 0)
+            elif event.key == pygame.K_RIGHT:
+                self.pan(step, 0)
+            elif event.key == pygame.K_UP:
+                self.pan(0, -step)
+            elif event.key == pygame.K_DOWN:
+                self.pan(0, step)
+            elif event.key == pygame.K_f:
+                self.following = True
+
+
+if __name__ == "__main__":
+    import os
+    import time
+    from mazegen import makeMazeArray
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    win = pygame.display.set_mode((625, 625))
+    maze = makeMazeArray(2048, seed=0)
+    viewport = Viewport(maze, (625, 625))
+
+    for scale in (25, 4, 1, 1 / 4, viewport.min_scale):
+        viewport.scale = scale
+        viewport.draw(win)  # Builds the pyramid level outside the timing
+        t0 = time.perf_counter()
+        for step in range(200):
+            viewport.follow(1 + step, 1 + step)
+            viewport.draw(win)
+            pygame.draw.rect(win, (255, 0, 0), viewport.cell_rect(1 + step, 1 + step))
+            pygame.display.flip()
+        print(f"{maze.shape[0]}x{maze.shape[1]} maze at {scale:g} px/cell: "
+              f"{(time.perf_counter() - t0) / 200 * 1000:.2f} ms/frame")
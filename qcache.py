@@ -0,0 +1,58 @@
+import hashlib
+import os
+import numpy as np
+
+
+def cache_key(maze, start, goal, teleport, **params):
+    """Hash of everything that determines a trained Q-table"""
+    maze = np.ascontiguousarray(maze)
+    h = hashlib.sha256()
+    h.update(repr((maze.shape, maze.dtype.str)).encode())
+    h.update(maze.tobytes())
+    h.update(repr((tuple(start), tuple(goal), teleport and tuple(teleport))).encode())
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+
+class QTableCache:
+    """Directory of float32 .npy Q-tables keyed by cache_key, evicted least recently used
+    first once the directory grows past max_bytes"""
+    def __init__(self, directory=".qcache", max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key):
+        """Memory-map a cached Q-table, or return None on a miss"""
+        path = self.path(key)
+        try:
+            Q = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)  # mtime doubles as the last-used time for eviction
+        return Q
+
+    def put(self, key, Q):
+        path = self.path(key)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(Q, dtype=np.float32))
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
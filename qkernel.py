@@ -0,0 +1,87 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, run_episodes falls back to plain Python
+    njit = None
+
+
+def _episodes(Q, next_state, reward, done, discount, start_state, n_episodes,
+              learning_rate, epsilon, explore, random_actions, state, episode,
+              max_episode_steps, episode_steps):
+    """Tabular Q-learning over precomputed transition tables, one step per random draw.
+
+    An episode ends at a terminal transition or after max_episode_steps steps (0 for no
+    cap). Runs until n_episodes have finished or the draws run out and returns
+    (state, episode, steps, episode_steps) so the caller can refill the draws and resume. Works on
+    arrays under numba or on memoryviews in plain Python, and every value is read as
+    a float64 so both give bit-identical Q-tables.
+    """
+    n_actions = Q.shape[1]
+    n_draws = explore.shape[0]
+    steps = 0
+    while episode < n_episodes and steps < n_draws:
+        if explore[steps] < epsilon:
+            action = random_actions[steps]
+        else:
+            action = 0  # First maximum, like np.argmax
+            for a in range(1, n_actions):
+                if Q[state, a] > Q[state, action]:
+                    action = a
+        steps += 1
+        episode_steps += 1
+
+        nxt = next_state[state, action]
+        best_next = np.float64(Q[nxt, 0])
+        for a in range(1, n_actions):
+            if Q[nxt, a] > best_next:
+                best_next = np.float64(Q[nxt, a])
+
+        q = np.float64(Q[state, action])
+        target = np.float64(reward[state, action]) + np.float64(discount[state, action]) * best_next
+        Q[state, action] = q + learning_rate * (target - q)
+
+        if done[state, action] or episode_steps == max_episode_steps:
+            episode += 1
+            episode_steps = 0
+            state = start_state
+        else:
+            state = nxt
+    return state, episode, steps, episode_steps
+
+
+_episodes_jit = njit(cache=True)(_episodes) if njit else None
+
+
+def uses_jit(Q, jit=True):
+    """Whether run_episodes trains this Q-table through the numba kernel"""
+    return jit and _episodes_jit is not None and Q.dtype != np.float16
+
+
+def run_episodes(Q, next_state, reward, done, discount, start_state, n_episodes,
+                 learning_rate, epsilon, rng, jit=True, chunk=1 << 16, max_episode_steps=None):
+    """Train Q in place for n_episodes episodes and return the number of steps taken.
+
+    Random draws come from rng in fixed-size chunks, so a seeded rng gives the same
+    Q-table with or without numba. jit=False forces the plain Python loop.
+    max_episode_steps cuts an episode short without a terminal update.
+    """
+    use_jit = uses_jit(Q, jit)
+    kernel = _episodes_jit if use_jit else _episodes
+    tables = (Q, next_state, reward, done, discount)
+    if not use_jit:
+        # memoryviews index much faster than arrays from Python, float16 has no memoryview format
+        tables = tuple(t if t.dtype == np.float16 else t.data for t in tables)
+
+    cap = int(max_episode_steps or 0)
+    state, episode, total, episode_steps = int(start_state), 0, 0, 0
+    while episode < n_episodes:
+        explore = rng.random(chunk)
+        random_actions = rng.integers(0, Q.shape[1], chunk)
+        if not use_jit:
+            explore, random_actions = explore.data, random_actions.data
+        state, episode, steps, episode_steps = kernel(*tables, start_state, n_episodes, learning_rate,
+                                                      epsilon, explore, random_actions, state, episode,
+                                                      cap, episode_steps)
+        total += steps
+    return total
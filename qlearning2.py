@@ -1,24 +1,131 @@
 import numpy as np
-import random
+import time
+from mazefile import load_maze, save_maze
+from qcache import QTableCache, cache_key
+from junctions import JunctionGraph
+from mazemodel import MazeModel, usable_teleport
+from qkernel import run_episodes, uses_jit, _episodes_jit
 
 class MazeSolver:
-    def __init__(self, maze, start, goal, learning_rate=0.1, discount_factor=0.9, epsilon=0.1, n_episodes=5000):
-        self.maze = maze
-        self.start = start
-        self.goal = goal
+    def __init__(self, maze, start, goal, learning_rate=0.1, discount_factor=0.9, epsilon=0.1, n_episodes=5000, *,
+                 teleport=(5, 15), cache_dir=None, seed=None,
+                 # How training runs
+                 backend="qlearning", tol=1e-6, batched=False, n_envs=64, jit=True,
+                 # How states and Q-values are stored
+                 compress=False, sparse=False, dtype=np.float64,
+                 # When an episode, and training, stop early
+                 max_episode_steps=None, check_every=100, stable_checks=None, q_tol=None, time_budget=None):
+        # 0/1/2 grid or char grid, start and goal default to the 'S' and 'G' cells
+        self.model = MazeModel.parse(maze, start, goal)
+        self.maze = maze = self.model.grid
+        self.start = start = self.model.start
+        self.goal = goal = self.model.goal
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
         self.epsilon = epsilon
         self.n_episodes = n_episodes
-        self.teleport = (5, 15)
+        self.teleport = usable_teleport(maze, teleport)  # None when off the grid or on a wall
+        self.batched = batched  # Train n_envs agents in lockstep instead of one at a time
+        self.n_envs = n_envs
+        self.backend = backend  # "qlearning", or "value_iteration" to plan on the known model
+        self.tol = tol
+        self.seed = seed
+        self.jit = jit  # Use the numba training kernel when numba is installed
+        self.max_episode_steps = max_episode_steps  # Cut an episode short after this many steps
+        # Early stopping, checked every check_every episodes: the greedy path from the start
+        # reached the goal unchanged stable_checks times in a row, no Q-value moved by
+        # q_tol or more since the last check, or time_budget seconds have passed
+        self.check_every = check_every
+        self.stable_checks = stable_checks
+        self.q_tol = q_tol
+        self.time_budget = time_budget
+        self.train_stats = None
+        self.trained = False  # Set once train(), the cache or load_q filled the Q-table
+        self.cache = QTableCache(cache_dir) if cache_dir is not None else None
 
         # Maze dimensions
         self.n_rows, self.n_cols = maze.shape
         self.n_states = self.n_rows * self.n_cols
         self.n_actions = 4  # Up, Down, Left, Right
+        self.dtype = dtype
+        # float16 only stores the result: near the -0.01 / (1 - discount) plateau a TD update
+        # is below half a float16 ulp and rounds away, so training runs in at least float32
+        self.train_dtype = np.promote_types(dtype, np.float32)
+
+        # With sparse=True only walkable cells are states: cells[state] is the flat cell
+        # of a state and cell_index[cell] the state of a cell (-1 for walls)
+        self.cells = None
+        self.cell_index = None
+        if sparse and not compress:
+            self.cells = np.flatnonzero(maze.ravel() != 1).astype(np.int32)
+            self.cell_index = np.full(self.n_states, -1, dtype=np.int32)
+            self.cell_index[self.cells] = np.arange(len(self.cells), dtype=np.int32)
+            self.n_states = len(self.cells)
+
+        # Transition tables, fixed for the lifetime of the solver
+        self.graph = None
+        if compress:
+            # States are the junctions of the maze and actions the corridors leaving them
+            self.graph = JunctionGraph(maze, start, goal, self.teleport)
+            self.n_states, self.n_actions = self.graph.n_nodes, self.graph.n_actions
+            self.next_state, self.reward, self.done, self.discount = self.graph.tables(discount_factor)
+            self.start_state = self.graph.node_index[self.to_state(*start)]
+            self.goal_state = self.graph.node_index[self.to_state(*goal)]
+        else:
+            self.next_state, self.reward, self.done = self.build_tables()
+            # Every grid step is discounted the same, so a zero-stride view stands in for the table
+            self.discount = np.broadcast_to(self.train_dtype.type(discount_factor), self.next_state.shape)
+            self.start_state = self.cell_state(self.to_state(*start))
+            self.goal_state = self.cell_state(self.to_state(*goal))
 
         # Initialize Q-table
-        self.Q = np.zeros((self.n_states, self.n_actions))
+        self.Q = np.zeros((self.n_states, self.n_actions), dtype=dtype)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Build a solver from a maze file, taking start, goal and teleport from its header"""
+        maze = load_maze(path)
+        kwargs.setdefault("teleport", maze.teleport)
+        return cls(maze.grid(), maze.start, maze.goal, **kwargs)
+
+    def save_maze(self, path):
+        save_maze(path, self.maze, self.start, self.goal, self.teleport)
+
+    def save_q(self, path):
+        np.save(path, self.Q.astype(np.float32))
+
+    def load_q(self, path):
+        """Memory-map a Q-table saved by save_q, solve() then uses it without training"""
+        Q = np.load(path, mmap_mode="r")
+        if Q.shape != (self.n_states, self.n_actions):
+            raise ValueError(f"Q-table has shape {Q.shape}, this solver needs {(self.n_states, self.n_actions)}")
+        self.Q = Q
+        self.trained = True
+
+    def cache_key(self):
+        return cache_key(self.maze, self.start, self.goal, self.teleport,
+                         learning_rate=self.learning_rate, discount_factor=self.discount_factor,
+                         epsilon=self.epsilon, n_episodes=self.n_episodes, batched=self.batched,
+                         n_envs=self.n_envs if self.batched else None,
+                         seed=self.seed,
+                         backend=self.backend, tol=self.tol, compress=self.graph is not None,
+                         sparse=self.cells is not None, dtype=np.dtype(self.dtype).name,
+                         max_episode_steps=self.max_episode_steps, check_every=self.check_every,
+                         stable_checks=self.stable_checks, q_tol=self.q_tol, time_budget=self.time_budget)
+
+    def train_cached(self):
+        """Load the Q-table from the cache if this exact setup was trained before, otherwise train and store it"""
+        key = self.cache_key()
+        Q = self.cache.get(key)
+        if Q is not None:
+            self.Q = Q
+            self.trained = True
+            self.train_stats = {"mode": "cache", "episodes": 0, "key": key}
+            return self.train_stats
+
+        self.train()
+        self.cache.put(key, self.Q)
+        return self.train_stats
 
     def to_row_col(self, state):
         return (state // self.n_cols, state % self.n_cols)
@@ -29,51 +136,328 @@ class MazeSolver:
     def is_terminal_state(self, row, col):
         return row == self.goal[0] and col == self.goal[1]
 
+    def cell_state(self, cell):
+        """State of a flat grid cell, the cell itself unless the Q-table is sparse"""
+        return cell if self.cell_index is None else int(self.cell_index[cell])
+
+    def state_cell(self, state):
+        """Flat grid cell of a state, the inverse of cell_state"""
+        return state if self.cells is None else self.cells[state]
+
+    def build_tables(self):
+        """Precompute next_state, reward and done for every (state, action) pair.
+        With a sparse Q-table walls aren't states, so bumping into one leaves the agent in place"""
+        states = np.arange(self.n_states) if self.cells is None else self.cells
+        next_cell, _ = self.model.move_table(states)
+        rows, cols = np.divmod(next_cell, self.n_cols)
+
+        teleported = np.zeros(rows.shape, dtype=bool)
+        if self.teleport is not None:
+            teleported = (rows == self.teleport[0]) & (cols == self.teleport[1])
+        at_goal = (rows == self.goal[0]) & (cols == self.goal[1])
+
+        hit_wall = self.maze[rows, cols] == 1
+        reward = np.where(hit_wall, -1.0, np.where(at_goal, 10.0, -0.01)).astype(self.train_dtype)
+        reward[teleported] = 5.0
+
+        # Walls first and the teleport last, so the teleport always wins like in the baseline step
+        next_state = next_cell
+        if self.cells is not None:
+            next_state = np.where(hit_wall, states[:, None], next_cell)
+        next_state = np.where(teleported, self.to_state(*self.goal), next_state)
+        if self.cells is not None:
+            next_state = self.cell_index[next_state]
+        return next_state, reward, at_goal | teleported
+
     def step(self, state, action):
-        row, col = self.to_row_col(state)
-
-        # Action logic
-        if action == 0: row = max(row - 1, 0)
-        elif action == 1: row = min(row + 1, self.n_rows - 1)
-        elif action == 2: col = max(col - 1, 0)
-        elif action == 3: col = min(col + 1, self.n_cols - 1)
-        
-        if (row, col) == self.teleport:
-            return self.to_state(*self.goal), 5, True
-    
-        # Reward logic
-        if self.maze[row, col] == 1: reward = -1
-        elif self.is_terminal_state(row, col): reward = 10
-        else: reward = -0.01
-
-        return self.to_state(row, col), reward, self.is_terminal_state(row, col)
+        return int(self.next_state[state, action]), float(self.reward[state, action]), bool(self.done[state, action])
 
     def train(self):
-        for episode in range(self.n_episodes):
-            state = self.to_state(*self.start)
-            done = False
+        if not self.Q.flags.writeable or self.Q.dtype != self.train_dtype:
+            # Q-table came from a read-only cache or file or is stored in float16, train on a copy
+            self.Q = np.array(self.Q, dtype=self.train_dtype)
+
+        if self.backend == "value_iteration":
+            stats = self.value_iteration()
+        else:
+            stats = self.train_episodes()
+        self.Q = self.Q.astype(self.dtype, copy=False)
+        self.trained = True
+        return stats
+
+    def train_episodes(self):
+        """Q-learning from the start state, with the early stopping checks between blocks"""
+        start_time = time.perf_counter()
+        mode = "batched" if self.batched else "jit" if uses_jit(self.Q, self.jit) else "scalar"
+        early = self.stable_checks is not None or self.q_tol is not None or self.time_budget is not None
+        block = self.check_every if early else self.n_episodes
+        rng = np.random.default_rng(self.seed)
+
+        episodes = steps = stable = 0
+        stopped, last_path, delta = "n_episodes", None, None
+        while episodes < self.n_episodes:
+            n = min(block, self.n_episodes - episodes)
+            previous = self.Q.copy() if self.q_tol is not None else None
+            steps += self.train_batched(n, rng) if self.batched else self.train_scalar(n, rng)
+            episodes += n
+            if episodes >= self.n_episodes:
+                break
+
+            if self.stable_checks is not None:
+                states, _, reached = self.greedy_states()
+                stable = stable + 1 if reached and states == last_path else 0
+                last_path = states if reached else None
+                if stable >= self.stable_checks:
+                    stopped = "stable_path"
+                    break
+            if self.q_tol is not None:
+                delta = float(np.abs(self.Q - previous).max())
+                if delta < self.q_tol:
+                    stopped = "q_tol"
+                    break
+            if self.time_budget is not None and time.perf_counter() - start_time >= self.time_budget:
+                stopped = "time_budget"
+                break
+
+        elapsed = time.perf_counter() - start_time
+        self.train_stats = {
+            "mode": mode,
+            "stopped": stopped,
+            "episodes": episodes,
+            "steps": steps,
+            "delta": delta,
+            "seconds": elapsed,
+            "episodes_per_sec": episodes / elapsed if elapsed > 0 else float("inf"),
+            "steps_per_sec": steps / elapsed if elapsed > 0 else float("inf"),
+        }
+        return self.train_stats
+
+    def train_scalar(self, n_episodes, rng):
+        """One agent at a time, through the numba kernel when available. Returns the step count"""
+        return run_episodes(self.Q, self.next_state, self.reward, self.done, self.discount,
+                            self.start_state, n_episodes, self.learning_rate, self.epsilon,
+                            rng, jit=self.jit, max_episode_steps=self.max_episode_steps)
+
+    def value_iteration(self, max_iterations=100000):
+        """Synchronous Q-value iteration over the transition tables, fills self.Q in place.
+
+        The goal's value spreads one step per sweep and shrinks by the discount as it goes,
+        so far from the goal it moves Q by less than tol long before it arrives, yet it
+        still decides the greedy action there. Every step costs and only the goal and the
+        teleport pay, so apart from that front Q-values only drift down. Sweeps stop once
+        no Q-value moved by tol or more, none rose at all and the greedy policy is the same
+        as one sweep before"""
+        start_time = time.perf_counter()
+        goal_state = self.goal_state
+        not_done = ~self.done
+        Q = np.zeros((self.n_states, self.n_actions), dtype=self.Q.dtype)
+        greedy = Q.argmax(axis=1)
+
+        for iteration in range(1, max_iterations + 1):
+            V = Q.max(axis=1)
+            V[goal_state] = 0  # The goal row is never updated by train() either
+            new_Q = self.reward + self.discount * not_done * V[self.next_state]
+            change = new_Q - Q
+            delta = np.abs(change).max()
+            rising = (change > 0).any()
+            Q = new_Q
 
-            while not done:
-                if random.uniform(0, 1) < self.epsilon:
-                    action = random.randint(0, self.n_actions - 1)
-                else:
-                    action = np.argmax(self.Q[state])
+            new_greedy = Q.argmax(axis=1)
+            stable = np.array_equal(new_greedy, greedy)
+            greedy = new_greedy
+            if delta < self.tol and not rising and stable:
+                break
 
-                next_state, reward, done = self.step(state, action)
+        Q[goal_state] = 0
+        self.Q = Q
+        elapsed = time.perf_counter() - start_time
+        self.train_stats = {
+            "mode": "value_iteration",
+            "iterations": iteration,
+            "delta": float(delta),
+            "seconds": elapsed,
+        }
+        return self.train_stats
 
-                # Q-table update
-                self.Q[state, action] += self.learning_rate * (reward + self.discount_factor * np.max(self.Q[next_state]) - self.Q[state, action])
+    def step_batch(self, states, actions):
+        """Vectorized version of step for arrays of states and actions"""
+        return self.next_state[states, actions], self.reward[states, actions], self.done[states, actions]
 
-                state = next_state
+    def train_batched(self, n_episodes, rng):
+        """Run n_envs episodes at once on the shared Q-table until n_episodes have finished"""
+        n_envs = min(self.n_envs, n_episodes)
+        start_state = self.start_state
+        max_episode_steps = self.max_episode_steps or np.iinfo(np.int64).max
+
+        states = np.full(n_envs, start_state)
+        ages = np.zeros(n_envs, dtype=np.int64)
+        active = np.ones(n_envs, dtype=bool)
+        started = n_envs
+        finished = 0
+        steps = 0
+
+        while finished < n_episodes:
+            idx = np.flatnonzero(active)
+            s = states[idx]
+            steps += idx.size
+
+            # Epsilon-greedy for every active agent at once
+            actions = np.argmax(self.Q[s], axis=1)
+            explore = rng.random(idx.size) < self.epsilon
+            actions[explore] = rng.integers(0, self.n_actions, explore.sum())
+
+            next_s, rewards, done = self.step_batch(s, actions)
+
+            # Agents sharing a (state, action) pair get their TD errors averaged
+            # so a crowd at the same cell doesn't overshoot the update
+            flat = s * self.n_actions + actions
+            td = rewards + self.discount[s, actions] * np.max(self.Q[next_s], axis=1) - self.Q[s, actions]
+            total = np.bincount(flat, weights=td, minlength=self.Q.size)
+            count = np.bincount(flat, minlength=self.Q.size)
+            touched = np.flatnonzero(count)
+            self.Q.flat[touched] += self.learning_rate * total[touched] / count[touched]
+
+            states[idx] = next_s
+            ages[idx] += 1
+
+            # Finished or capped agents restart from the start cell while episodes remain
+            done_idx = idx[done | (ages[idx] >= max_episode_steps)]
+            finished += done_idx.size
+            restart = done_idx[:max(n_episodes - started, 0)]
+            started += restart.size
+            states[restart] = start_state
+            ages[restart] = 0
+            active[done_idx[restart.size:]] = False
+        return steps
 
     def solve(self):
-        self.train()  # Ensure the model is trained
+        """Greedy path from the start as (row, col) cells. It stops short of the goal when the
+        greedy policy loops, see greedy_states"""
+        # Ensure the model is trained, a table from load_q or an earlier train() is used as is
+        if not self.trained:
+            if self.cache is not None:
+                self.train_cached()
+            else:
+                self.train()
+
+        states, actions, _ = self.greedy_states()
+        if self.graph is not None:
+            return self.graph.expand(states, actions)
+        return [self.to_row_col(int(self.state_cell(state))) for state in states]
+
+    def greedy_states(self, max_steps=None):
+        """Greedy walk from the start over states. Returns (states, actions, reached) and
+        stops at the goal, when a state repeats or after max_steps steps"""
+        if max_steps is None:
+            max_steps = self.n_states
+        state, states, actions = self.start_state, [self.start_state], []
+        visited = {state}
+        while state != self.goal_state and len(actions) < max_steps:
+            action = int(np.argmax(self.Q[state]))
+            state = int(self.next_state[state, action])
+            if state in visited:
+                break
+            visited.add(state)
+            states.append(state)
+            actions.append(action)
+        return states, actions, state == self.goal_state
+
+    def greedy_successor(self):
+        """Next state of every state under the greedy policy, with the goal as an absorbing state"""
+        goal_state = self.goal_state
+        succ = self.next_state[np.arange(self.n_states), np.argmax(self.Q, axis=1)]
+        succ[goal_state] = goal_state
+        return succ
+
+    def query_paths(self, starts, max_steps=None):
+        """Greedy paths from many start cells at once, without retraining.
+
+        Returns (offsets, cells, reached): path i is cells[offsets[i]:offsets[i + 1]] as
+        (row, col) rows. A path that loops stops just before its first repeated state and
+        is marked False in reached, so no path holds more than n_states cells. max_steps
+        optionally cuts paths shorter, marking those that miss the goal in time False too.
+        """
+        if self.graph is not None:
+            raise ValueError("query_paths works on the full grid, build the solver with compress=False")
+        starts = np.asarray(starts, dtype=np.int64).reshape(-1, 2)
+        states = starts[:, 0] * self.n_cols + starts[:, 1]
+        if self.cell_index is not None:
+            states = self.cell_index[states].astype(np.int64)
+            if (states < 0).any():
+                raise ValueError("start cells must be walkable with a sparse Q-table")
+        goal_state = self.goal_state
+        n_states = self.n_states
+        rounds = int(n_states).bit_length()  # 2 ** rounds > n_states
+
+        # Every greedy walk ends in a cycle, the goal being a cycle of one. States on a
+        # cycle are those reached after n_states steps, and labelling each state with the
+        # smallest state within 2 ** rounds steps names every cycle by its smallest member
+        succ = self.greedy_successor()
+        jump = succ.copy()
+        label = np.arange(n_states)
+        for _ in range(rounds):
+            label = np.minimum(label, label[jump])
+            jump = jump[jump]
+        on_cycle = np.zeros(n_states, dtype=bool)
+        on_cycle[jump] = True
+        cycle_length = np.bincount(label[on_cycle], minlength=n_states)
+
+        # Steps from every state to the first cycle state on its walk, by pointer doubling
+        jump = np.where(on_cycle, np.arange(n_states), succ)
+        dist = (~on_cycle).astype(np.int64)
+        for _ in range(rounds):
+            dist += dist[jump]
+            jump = jump[jump]
+
+        entry = jump[states]
+        reached = entry == goal_state
+        # A looping path runs once around its cycle and stops before the entry comes back
+        steps = np.where(reached, dist[states], dist[states] + cycle_length[label[entry]] - 1)
+        if max_steps is not None:
+            reached &= steps <= max_steps
+            steps = np.minimum(steps, max_steps)
+
+        offsets = np.zeros(len(states) + 1, dtype=np.int64)
+        np.cumsum(steps + 1, out=offsets[1:])
+        flat = np.empty(offsets[-1], dtype=np.int64)
+
+        # Batched rollout, one vectorized step for every path still running
+        current = states.copy()
+        position = offsets[:-1].copy()
+        for t in range(int(steps.max(initial=-1)) + 1):
+            running = np.flatnonzero(steps >= t)
+            flat[position[running]] = current[running]
+            current[running] = succ[current[running]]
+            position[running] += 1
+
+        flat = self.state_cell(flat)
+        cells = np.stack((flat // self.n_cols, flat % self.n_cols), axis=1).astype(np.int32)
+        return offsets, cells, reached
+
+
+if __name__ == "__main__":
+    from mazegen import makeMaze
+
+    maze = np.array(makeMaze(12))
+    start, goal = (1, 1), (maze.shape[0] - 2, maze.shape[1] - 2)
+
+    scalar = MazeSolver(maze, start, goal, n_episodes=500, jit=False).train()
+    batched = MazeSolver(maze, start, goal, n_episodes=500, batched=True).train()
+    print(f"scalar:  {scalar['episodes_per_sec']:.1f} episodes/sec")
+    print(f"batched: {batched['episodes_per_sec']:.1f} episodes/sec")
+    print(f"speedup: {batched['episodes_per_sec'] / scalar['episodes_per_sec']:.1f}x")
+
+    if _episodes_jit is not None:
+        MazeSolver(maze, start, goal, n_episodes=1).train()  # Compile outside the timing
+        jit = MazeSolver(maze, start, goal, n_episodes=500).train()
+        print(f"jit:     {jit['steps_per_sec']:.0f} steps/sec, "
+              f"{jit['steps_per_sec'] / scalar['steps_per_sec']:.1f}x the Python loop")
 
-        state = self.to_state(*self.start)
-        path = [self.to_row_col(state)]
-        while not self.is_terminal_state(*path[-1]):
-            action = np.argmax(self.Q[state])
-            state, _, _ = self.step(state, action)
-            path.append(self.to_row_col(state))
+    scalar = MazeSolver(maze, start, goal, jit=False).train()
+    planned = MazeSolver(maze, start, goal, backend="value_iteration").train()
+    print(f"train():          {scalar['seconds']:.3f}s for {scalar['episodes']} episodes")
+    print(f"value iteration:  {planned['seconds']:.3f}s for {planned['iterations']} sweeps")
 
-        return path
+    early = MazeSolver(maze, start, goal, stable_checks=5, max_episode_steps=maze.size).train()
+    print(f"early stopping:   {early['seconds']:.3f}s, stopped on {early['stopped']} "
+          f"after {early['episodes']} episodes")
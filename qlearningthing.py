@@ -1,60 +1,114 @@
 import numpy as np
+from mazemodel import MazeModel
+from qkernel import run_episodes
 
 class QLearningMazeSolver:
-    def __init__(self, maze, learning_rate=0.1, discount_factor=0.9, exploration_rate=0.1, epochs=1000):
+    def __init__(self, maze, learning_rate=0.1, discount_factor=0.9, exploration_rate=0.1, epochs=1000, sparse=False, dtype=np.float64, goal=None, seed=None, jit=True):
         self.maze = maze
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
         self.exploration_rate = exploration_rate
         self.epochs = epochs
+        self.seed = seed
+        self.jit = jit  # Train through the numba kernel when numba is installed
         self.actions = [(0, 1), (0, -1), (1, 0), (-1, 0)]  # Right, Left, Down, Up
-        self.q_table = np.zeros((len(maze), len(maze[0]), len(self.actions)))
-        
+
+        # Char grid or 0/1 grid, parsed once into arrays with a move table in our action order
+        self.model = MazeModel.parse(maze, goal=goal, moves=self.actions)
+        self.goal_cell = self.model.to_cell(*self.model.goal) if self.model.goal is not None else -1
+
+        if sparse:
+            # Only walkable cells get a Q row, cell_index maps (row, col) to it (-1 for walls)
+            walkable = self.model.walkable
+            self.cells = np.flatnonzero(walkable)  # Flat cell of every Q row
+            self.cell_index = np.full(walkable.shape, -1, dtype=np.int32)
+            self.cell_index[walkable] = np.arange(walkable.sum(), dtype=np.int32)
+            self.q_table = np.zeros((walkable.sum(), len(self.actions)), dtype=dtype)
+        else:
+            self.cells = None
+            self.cell_index = None
+            self.q_table = np.zeros((self.model.n_rows, self.model.n_cols, len(self.actions)), dtype=dtype)
+
+        self.next_state, self.reward, self.done = self.build_tables()
+
+    def q_values(self, state):
+        """Q row of a cell, a view into q_table so it can be updated in place"""
+        if self.cell_index is not None:
+            return self.q_table[self.cell_index[state]]
+        return self.q_table[state[0], state[1]]
+
+    def state_index(self, state):
+        """Row of a (row, col) cell in the flat Q-table used for training"""
+        cell = self.model.to_cell(*state)
+        return cell if self.cell_index is None else int(self.cell_index.flat[cell])
+
+    def state_cell(self, index):
+        """(row, col) cell of a flat Q-table row, the inverse of state_index"""
+        return self.model.to_row_col(index if self.cells is None else self.cells[index])
+
+    def build_tables(self):
+        """next_state, reward and done over flat Q-table rows, with the same rules as step"""
+        next_cell, valid = self.model.move_table(self.cells)
+        cells = np.arange(self.model.n_cells) if self.cells is None else self.cells
+        next_cell = np.where(valid, next_cell, cells[:, None])
+
+        reward = np.where(valid, np.where(next_cell == self.goal_cell, 1.0, 0.0), -1.0)
+        done = ~valid | (next_cell == self.goal_cell)
+        next_state = next_cell if self.cell_index is None else self.cell_index.ravel()[next_cell]
+        return next_state.astype(np.int64), reward, done
+
     def choose_action(self, state):
         if np.random.rand() < self.exploration_rate:
             return np.random.randint(len(self.actions))  # Explore action space
         else:
-            return np.argmax(self.q_table[state[0], state[1]])  # Exploit learned values
+            return np.argmax(self.q_values(state))  # Exploit learned values
     
     def update_q_table(self, state, action, reward, next_state):
-        best_next_action = np.argmax(self.q_table[next_state[0], next_state[1]])
-        current_q_value = self.q_table[state[0], state[1], action]
+        next_q = self.q_values(next_state)
+        best_next_action = np.argmax(next_q)
+        q = self.q_values(state)
+        current_q_value = q[action]
         new_q_value = current_q_value + self.learning_rate * (reward + 
-                            self.discount_factor * self.q_table[next_state[0], next_state[1], best_next_action] - current_q_value)
-        self.q_table[state[0], state[1], action] = new_q_value
+                            self.discount_factor * next_q[best_next_action] - current_q_value)
+        q[action] = new_q_value
     
     def train(self, start):
-        for _ in range(self.epochs):
-            state = start
-            done = False
-            while not done:
-                action = self.choose_action(state)
-                next_state, reward, done = self.step(state, action)
-                self.update_q_table(state, action, reward, next_state)
-                state = next_state
+        q_table = self.q_table.reshape(-1, len(self.actions))  # A view, updated in place
+        # A float16 table only stores the result, its updates would round away during training
+        work = q_table.astype(np.promote_types(q_table.dtype, np.float32), copy=False)
+        discount = np.broadcast_to(np.float64(self.discount_factor), self.next_state.shape)
+        run_episodes(work, self.next_state, self.reward, self.done, discount,
+                     self.state_index(start), self.epochs, self.learning_rate, self.exploration_rate,
+                     np.random.default_rng(self.seed), jit=self.jit)
+        if work is not q_table:
+            q_table[:] = work
     
     def step(self, state, action):
-        next_state = (state[0] + self.actions[action][0], state[1] + self.actions[action][1])
-        if self.is_valid_move(next_state):
-            if self.maze[next_state[0]][next_state[1]] == 'G':
-                return next_state, 1, True  # Reached goal
-            return next_state, 0, False  # Valid move
-        return state, -1, True  # Invalid move
+        """One lookup in the tables train() uses: an invalid move stays put with -1 and ends
+        the episode, reaching the goal pays 1, any other move 0"""
+        index = self.state_index(state)
+        next_state = self.state_cell(self.next_state[index, action])
+        return next_state, float(self.reward[index, action]), bool(self.done[index, action])
     
     def is_valid_move(self, state):
-        rows = len(self.maze)
-        cols = len(self.maze[0])
-        return 0 <= state[0] < rows and 0 <= state[1] < cols and self.maze[state[0]][state[1]] != '#'
+        return self.model.is_walkable(*state)
     
-    def find_path(self, start):
+    def find_path(self, start, max_steps=None):
+        """Greedy path from start. Stops at the goal, on an invalid move, when a cell repeats
+        (the greedy policy would loop forever from there) or after max_steps steps"""
+        if max_steps is None:
+            max_steps = self.model.n_cells
         path = [start]
+        visited = {start}
         state = start
-        while self.maze[state[0]][state[1]] != 'G':
-            action = np.argmax(self.q_table[state[0], state[1]])
-            next_state = (state[0] + self.actions[action][0], state[1] + self.actions[action][1])
+        while state != self.model.goal and len(path) <= max_steps:
+            action = np.argmax(self.q_values(state))
+            next_state, _, _ = self.step(state, action)
+            if next_state in visited:
+                break
             path.append(next_state)
+            visited.add(next_state)
             state = next_state
-            print(state)
         return path
 
 # Example maze
@@ -0,0 +1,254 @@
+import heapq
+from collections import OrderedDict, deque
+import numpy as np
+from qcache import cache_key
+from mazemodel import usable_teleport
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the distance field BFS falls back to plain Python
+    njit = None
+
+MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))  # Up, Down, Left, Right, same order as MazeSolver
+
+
+def _walkable(maze, cell):
+    row, col = cell
+    return 0 <= row < maze.shape[0] and 0 <= col < maze.shape[1] and maze[row, col] != 1
+
+
+def neighbors(maze, cell, goal, teleport=None):
+    """Cells reachable in one step. Stepping onto the teleport lands on the goal, like MazeSolver.step"""
+    for dr, dc in MOVES:
+        nxt = (cell[0] + dr, cell[1] + dc)
+        if _walkable(maze, nxt):
+            yield goal if nxt == teleport else nxt
+
+
+def predecessors(maze, cell, goal, teleport=None):
+    """Reverse of neighbors, used by the backward half of bidirectional search"""
+    if cell == teleport:
+        return
+    for dr, dc in MOVES:
+        prev = (cell[0] + dr, cell[1] + dc)
+        if _walkable(maze, prev) and prev != teleport:
+            yield prev
+    if cell == goal and teleport is not None:
+        for dr, dc in MOVES:
+            prev = (teleport[0] + dr, teleport[1] + dc)
+            if _walkable(maze, prev) and prev != teleport:
+                yield prev
+
+
+def _walk_back(parents, cell):
+    path = []
+    while cell is not None:
+        path.append(cell)
+        cell = parents[cell]
+    return path[::-1]
+
+
+def bfs(maze, start, goal, teleport=None):
+    """Shortest path as a list of (row, col), or None if the goal can't be reached"""
+    maze = np.asarray(maze)
+    start, goal = tuple(start), tuple(goal)
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        if cell == goal:
+            return _walk_back(parents, cell)
+        for nxt in neighbors(maze, cell, goal, teleport):
+            if nxt not in parents:
+                parents[nxt] = cell
+                queue.append(nxt)
+    return None
+
+
+def astar(maze, start, goal, teleport=None):
+    """A* with a Manhattan heuristic. With a teleport the heuristic is the shorter of
+    the distance to the goal and to the teleport, so it stays admissible"""
+    maze = np.asarray(maze)
+    start, goal = tuple(start), tuple(goal)
+
+    def h(cell):
+        d = abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])
+        if teleport is not None:
+            d = min(d, abs(cell[0] - teleport[0]) + abs(cell[1] - teleport[1]))
+        return d
+
+    parents = {start: None}
+    cost = {start: 0}
+    heap = [(h(start), 0, start)]
+    while heap:
+        _, g, cell = heapq.heappop(heap)
+        if cell == goal:
+            return _walk_back(parents, cell)
+        if g > cost[cell]:
+            continue
+        for nxt in neighbors(maze, cell, goal, teleport):
+            if g + 1 < cost.get(nxt, g + 2):
+                cost[nxt] = g + 1
+                parents[nxt] = cell
+                heapq.heappush(heap, (g + 1 + h(nxt), g + 1, nxt))
+    return None
+
+
+def bidirectional(maze, start, goal, teleport=None):
+    """Bidirectional BFS, expanding the smaller frontier one full layer at a time"""
+    maze = np.asarray(maze)
+    start, goal = tuple(start), tuple(goal)
+    if start == goal:
+        return [start]
+
+    forward, backward = {start: None}, {goal: None}
+    fdist, bdist = {start: 0}, {goal: 0}
+    front, back = [start], [goal]
+    while front and back:
+        meets = []
+        if len(front) <= len(back):
+            layer = []
+            for cell in front:
+                for nxt in neighbors(maze, cell, goal, teleport):
+                    if nxt not in forward:
+                        forward[nxt] = cell
+                        fdist[nxt] = fdist[cell] + 1
+                        layer.append(nxt)
+                        if nxt in backward:
+                            meets.append(nxt)
+            front = layer
+        else:
+            layer = []
+            for cell in back:
+                for prev in predecessors(maze, cell, goal, teleport):
+                    if prev not in backward:
+                        backward[prev] = cell
+                        bdist[prev] = bdist[cell] + 1
+                        layer.append(prev)
+                        if prev in forward:
+                            meets.append(prev)
+            back = layer
+
+        if meets:
+            meet = min(meets, key=lambda cell: fdist[cell] + bdist[cell])
+            path = _walk_back(forward, meet)
+            cell = backward[meet]
+            while cell is not None:
+                path.append(cell)
+                cell = backward[cell]
+            return path
+    return None
+
+
+def _bfs_field(walkable, dist, queue, n_cols, seeds):
+    """Array-based BFS from the seed cells over flat indices, filling dist in place"""
+    n = walkable.shape[0]
+    head = 0
+    tail = 0
+    for s in seeds:
+        dist[s] = 0
+        queue[tail] = s
+        tail += 1
+
+    while head < tail:
+        cell = queue[head]
+        head += 1
+        d = dist[cell] + 1
+        col = cell % n_cols
+        for nxt in (cell - n_cols, cell + n_cols, cell - 1, cell + 1):
+            if nxt < 0 or nxt >= n:
+                continue
+            if (nxt == cell - 1 and col == 0) or (nxt == cell + 1 and col == n_cols - 1):
+                continue
+            if walkable[nxt] and dist[nxt] < 0:
+                dist[nxt] = d
+                queue[tail] = nxt
+                tail += 1
+    return dist
+
+
+_bfs_field_jit = njit(cache=True)(_bfs_field) if njit else None
+
+_fields = OrderedDict()
+FIELD_CACHE_SIZE = 8
+
+
+def distance_field(maze, goal, teleport=None, key=None):
+    """Steps from every cell to the goal (-1 where unreachable), cached per maze hash.
+    The teleport cell counts as the goal, since stepping onto it ends there. Hashing a
+    big maze costs about as much as a descent, so callers that query one maze many times
+    can pass their own key for it, which must change whenever the maze does. A teleport
+    off the grid or on a wall is ignored, like in MazeSolver"""
+    maze = np.asarray(maze)
+    teleport = usable_teleport(maze, teleport)
+    key = cache_key(maze, (), goal, teleport) if key is None else (key, tuple(goal), teleport and tuple(teleport))
+    if key in _fields:
+        _fields.move_to_end(key)
+        return _fields[key]
+
+    n_rows, n_cols = maze.shape
+    walkable = (maze != 1).ravel().astype(np.uint8)
+    dist = np.full(maze.size, -1, dtype=np.int32)
+    queue = np.empty(maze.size, dtype=np.int64)
+    seeds = [goal[0] * n_cols + goal[1]]
+    if teleport is not None:
+        seeds.append(teleport[0] * n_cols + teleport[1])
+    seeds = np.array(seeds, dtype=np.int64)
+
+    if _bfs_field_jit is not None:
+        _bfs_field_jit(walkable, dist, queue, n_cols, seeds)
+    else:
+        _bfs_field(walkable.data, dist.data, queue.data, n_cols, seeds.tolist())
+
+    field = dist.reshape(n_rows, n_cols)
+    field.flags.writeable = False
+    _fields[key] = field
+    if len(_fields) > FIELD_CACHE_SIZE:
+        _fields.popitem(last=False)
+    return field
+
+
+def descend(field, start, goal, teleport=None):
+    """Follow a distance field downhill from start, O(path length)"""
+    cell = tuple(start)
+    if cell == teleport and cell != tuple(goal):
+        # Standing on the teleport doesn't end the walk, only stepping onto it does, so
+        # take the first step to the best neighbour like the other searches would
+        best = None
+        for dr, dc in MOVES:
+            nxt = (cell[0] + dr, cell[1] + dc)
+            if (0 <= nxt[0] < field.shape[0] and 0 <= nxt[1] < field.shape[1] and field[nxt] >= 0
+                    and (best is None or field[nxt] < field[best])):
+                best = nxt
+        if best is None:
+            return None
+        return [cell] + descend(field, best, goal, teleport)
+
+    if field[cell] < 0:
+        return None
+    path = [cell]
+    while field[cell] > 0:
+        for dr, dc in MOVES:
+            nxt = (cell[0] + dr, cell[1] + dc)
+            if (0 <= nxt[0] < field.shape[0] and 0 <= nxt[1] < field.shape[1]
+                    and field[nxt] == field[cell] - 1):
+                cell = nxt
+                break
+        path.append(goal if cell == teleport else cell)
+    return path
+
+
+def shortest_path(maze, start, goal, teleport=None, method="field", key=None):
+    """Exact shortest path with one of "field", "bfs", "astar" or "bidirectional".
+    key is passed on to distance_field, so repeated queries on one maze skip hashing it.
+    A teleport off the grid or on a wall is ignored, like in MazeSolver"""
+    teleport = usable_teleport(maze, teleport)
+    if method == "field":
+        return descend(distance_field(maze, goal, teleport, key), start, goal, teleport)
+    if method == "bfs":
+        return bfs(maze, start, goal, teleport)
+    if method == "astar":
+        return astar(maze, start, goal, teleport)
+    if method == "bidirectional":
+        return bidirectional(maze, start, goal, teleport)
+    raise ValueError(f"unknown method {method!r}")
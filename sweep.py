@@ -0,0 +1,116 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from qlearning2 import MazeSolver
+
+RESULT_FIELDS = [
+    ("maze", np.int32), ("seed", np.int64),
+    ("learning_rate", np.float64), ("discount_factor", np.float64),
+    ("epsilon", np.float64), ("n_episodes", np.int64),
+    ("converged_episode", np.int64), ("path_length", np.int64),
+    ("reached", np.bool_), ("seconds", np.float64),
+]
+
+# Shared maze blocks attached by this worker process, by name
+_attached = {}
+
+
+def _share(maze):
+    maze = np.ascontiguousarray(maze, dtype=np.uint8)
+    shm = shared_memory.SharedMemory(create=True, size=maze.nbytes)
+    np.ndarray(maze.shape, dtype=np.uint8, buffer=shm.buf)[:] = maze
+    return shm, (shm.name, maze.shape)
+
+
+def _attach(name, shape):
+    """Zero-copy view of a maze the parent put in shared memory"""
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.uint8, buffer=_attached[name].buf)
+
+
+def _path_length(solver, states, actions):
+    """Greedy path length in grid steps, corridors count their full length on a junction graph"""
+    if solver.graph is None:
+        return len(actions)
+    return int(sum(solver.graph.edge_length[solver.graph.edge_id[s, a]] for s, a in zip(states, actions)))
+
+
+def _run_job(job):
+    """Train one (maze, seed, hyperparameters) job in blocks of check_every episodes. The
+    convergence episode is the first block end after which the greedy path from the start
+    reaches the goal and never changes again"""
+    maze_id, shared, start, goal, seed, params, solver_kwargs, check_every = job
+    maze = _attach(*shared)
+    params = dict(params)
+    n_episodes = params.pop("n_episodes")
+
+    t0 = time.perf_counter()
+    solver = MazeSolver(maze, start, goal, n_episodes=check_every, **params, **solver_kwargs)
+    seeds = np.random.SeedSequence(seed).spawn((n_episodes + check_every - 1) // check_every)
+    converged, last_path = -1, None
+    for block, block_seed in enumerate(seeds):
+        solver.n_episodes = min(check_every, n_episodes - block * check_every)
+        solver.seed = block_seed
+        solver.train()
+
+        states, actions, reached = solver.greedy_states()
+        if not reached or states != last_path:
+            converged = (block + 1) * check_every if reached else -1
+        last_path = states
+    seconds = time.perf_counter() - t0
+
+    states, actions, reached = solver.greedy_states()
+    row = (maze_id, seed, solver.learning_rate, solver.discount_factor, solver.epsilon, n_episodes,
+           min(converged, n_episodes), _path_length(solver, states, actions) if reached else -1, reached, seconds)
+    return row, np.asarray(solver.Q, dtype=np.float32)
+
+
+def run_sweep(mazes, grid, seeds=(0,), starts=None, goals=None, solver_kwargs=None,
+              check_every=100, max_workers=None):
+    """Train MazeSolver on every (maze, seed, hyperparameter combination) across a process pool.
+
+    grid maps MazeSolver hyperparameters (learning_rate, discount_factor, epsilon, n_episodes)
+    to lists of values. Mazes reach the workers through shared memory instead of pickling.
+    Returns a structured array with one row per job and the float32 Q-tables in the same order.
+    """
+    solver_kwargs = dict({"teleport": None}, **(solver_kwargs or {}))
+    defaults = {"learning_rate": 0.1, "discount_factor": 0.9, "epsilon": 0.1, "n_episodes": 5000}
+    names = list(grid)
+    combos = [dict(defaults, **dict(zip(names, values))) for values in itertools.product(*grid.values())]
+
+    blocks = [_share(maze) for maze in mazes]
+    try:
+        jobs = []
+        for i, (maze, (_, shared)) in enumerate(zip(mazes, blocks)):
+            shape = np.shape(maze)
+            start = starts[i] if starts is not None else (1, 1)
+            goal = goals[i] if goals is not None else (shape[0] - 2, shape[1] - 2)
+            for seed in seeds:
+                for params in combos:
+                    jobs.append((i, shared, start, goal, seed, params, solver_kwargs, check_every))
+
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            results = list(pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (8 * (os.cpu_count() or 1)))))
+    finally:
+        for shm, _ in blocks:
+            shm.close()
+            shm.unlink()
+
+    table = np.array([row for row, _ in results], dtype=RESULT_FIELDS)
+    return table, [Q for _, Q in results]
+
+
+if __name__ == "__main__":
+    from mazegen import makeMazeArray
+
+    mazes = [makeMazeArray(10, seed) for seed in range(4)]
+    grid = {"learning_rate": [0.1, 0.5], "discount_factor": [0.9, 0.99], "n_episodes": [1000]}
+    t0 = time.perf_counter()
+    table, _ = run_sweep(mazes, grid, seeds=range(2))
+    print(f"{len(table)} jobs in {time.perf_counter() - t0:.2f}s on {os.cpu_count()} cores")
+    for row in table:
+        print(row)
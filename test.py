@@ -1,5 +1,8 @@
 import pygame
+import sys
 from mazegen import makeMaze
+from mazeview import MazeRenderer, Viewport
+from mazefile import load_maze
 from qlearning2 import MazeSolver
 import numpy as np
 
@@ -30,6 +33,10 @@ maze = [[1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
 [1, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
 [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]]
 
+if len(sys.argv) > 1:
+    # python test.py path/to/file.maze, read through the memory map as the view needs it
+    maze = load_maze(sys.argv[1])
+
 
 # Player variables
 x = 25
@@ -52,6 +59,13 @@ pygame.init()
 win = pygame.display.set_mode((625, 625)) 
 pygame.display.set_caption("Moving rectangle") 
 
+# Only the cells in view are drawn, and only repainted when the camera moves. Otherwise
+# each frame just redraws the player's old and new rects. Wheel or +/- zoom, arrow keys
+# or dragging pan, f follows the player again
+viewport = Viewport(maze, win.get_size(), cell_size)
+viewport.follow(y / cell_size, x / cell_size, smoothing=1)
+renderer = MazeRenderer(win, viewport.frame()[0])
+
 run = True
 while run: 
     pygame.time.delay(10) 
@@ -59,23 +73,23 @@ while run:
     for event in pygame.event.get(): 
         if event.type == pygame.QUIT: 
             run = False
+        if event.type == pygame.VIDEOEXPOSE:
+            renderer.redraw()
+        viewport.handle_event(event)
 
     keys = pygame.key.get_pressed() 
     
-
-    # Draw the maze
-    for my in range(len(maze)):
-        for mx in range(len(maze[my])):
-            if maze[my][mx] == 1:
-                pygame.draw.rect(win, (0, 0, 255), (mx * cell_size, my * cell_size, cell_size, cell_size))
-            
-            if maze[my][mx] == 2:
-                pygame.draw.rect(win, (0, 255, 0), (mx * cell_size, my * cell_size, cell_size, cell_size))
+    viewport.follow(y / cell_size, x / cell_size)
+    background, moved = viewport.frame()
+    if moved:
+        renderer.background = background
+        renderer.redraw()
+    renderer.clear()
 
     # Draw the player
-    pygame.draw.rect(win, (255, 0, 0), (x, y, width, height)) 
+    renderer.rect((255, 0, 0), viewport.cell_rect(y / cell_size, x / cell_size))
 
-    pygame.display.update() 
+    renderer.flip()
 
 pygame.quit()
 
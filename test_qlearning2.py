@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from mazegen import makeMazeArray
+from qlearning2 import MazeSolver
+
+
+def make_solver(dtype, seed=0):
+    maze = makeMazeArray(10, seed=seed)
+    goal = (maze.shape[0] - 2, maze.shape[1] - 2)
+    return MazeSolver(maze, (1, 1), goal, teleport=None, sparse=True, dtype=dtype,
+                      n_episodes=2000, max_episode_steps=2000, seed=seed)
+
+
+def test_float16_q_table_learns():
+    solver = make_solver(np.float16)
+    stats = solver.train()
+    _, _, reached = solver.greedy_states()
+    assert reached
+    assert solver.Q.dtype == np.float16
+    # Nearly every episode hit the step cap when the updates ran in float16
+    assert stats["steps"] < solver.n_episodes * solver.max_episode_steps / 4
+
+
+def test_float16_trains_like_float32():
+    half, single = make_solver(np.float16), make_solver(np.float32)
+    half.train()
+    single.train()
+    np.testing.assert_array_equal(half.Q, single.Q.astype(np.float16))
+
+
+def test_compress_follows_grid_teleport_rule():
+    maze = makeMazeArray(5, seed=0)
+    goal = (maze.shape[0] - 2, maze.shape[1] - 2)
+    assert maze[2, 2] == 1 and maze[5, 5] != 1
+    # Off the grid (the default), on a wall and on an open cell
+    for teleport in [(5, 15), (2, 2), (5, 5)]:
+        kwargs = dict(teleport=teleport, backend="value_iteration")
+        compressed = MazeSolver(maze, (1, 1), goal, compress=True, **kwargs)
+        grid = MazeSolver(maze, (1, 1), goal, **kwargs)
+        compressed.train()
+        grid.train()
+        np.testing.assert_allclose(compressed.Q[compressed.start_state].max(),
+                                   grid.Q[grid.start_state].max())
+        assert len(compressed.solve()) == len(grid.solve())
+
+
+def test_compress_keeps_walk_and_teleport_into_goal():
+    # From the start, walking right reaches the goal in 4 steps and walking down reaches
+    # the teleport in 2. The walk earns more, so it must survive next to the teleport edge
+    maze = np.array([[1, 1, 1, 1, 1, 1, 1],
+                     [1, 0, 0, 0, 0, 0, 1],
+                     [1, 0, 1, 1, 1, 1, 1],
+                     [1, 0, 1, 1, 1, 1, 1],
+                     [1, 1, 1, 1, 1, 1, 1]])
+    kwargs = dict(teleport=(3, 1), backend="value_iteration")
+    compressed = MazeSolver(maze, (1, 1), (1, 5), compress=True, **kwargs)
+    grid = MazeSolver(maze, (1, 1), (1, 5), **kwargs)
+    assert compressed.done[compressed.start_state].sum() == 2
+    compressed.train()
+    grid.train()
+    np.testing.assert_allclose(compressed.Q[compressed.start_state].max(),
+                               grid.Q[grid.start_state].max())
+    assert compressed.solve() == [(1, 1), (1, 2), (1, 3), (1, 4), (1, 5)]
+
+
+def test_query_paths_stop_looping_paths_at_first_repeat():
+    maze = makeMazeArray(8, seed=1)
+    goal = (maze.shape[0] - 2, maze.shape[1] - 2)
+    solver = MazeSolver(maze, (1, 1), goal, teleport=None, sparse=True, n_episodes=20,
+                        max_episode_steps=50, seed=1)
+    solver.train()  # Far from converged, so many greedy paths loop
+    starts = np.argwhere(maze != 1)
+    offsets, cells, reached = solver.query_paths(starts)
+
+    succ = solver.greedy_successor()
+    for i, (row, col) in enumerate(starts):
+        state, walk = solver.cell_state(solver.to_state(row, col)), []
+        while state not in walk:
+            walk.append(state)
+            if state == solver.goal_state:
+                break
+            state = int(succ[state])
+        expected = [solver.to_row_col(int(solver.state_cell(s))) for s in walk]
+        assert [tuple(c) for c in cells[offsets[i]:offsets[i + 1]]] == expected
+        assert reached[i] == (walk[-1] == solver.goal_state)
+    assert not reached.all()
+
+
+def test_solve_uses_loaded_q_table(tmp_path):
+    trained = make_solver(np.float32)
+    trained.train()
+    trained.save_q(tmp_path / "q.npy")
+
+    loaded = make_solver(np.float32)
+    loaded.load_q(tmp_path / "q.npy")
+    assert loaded.solve() == trained.solve()
+    assert loaded.train_stats is None  # solve() didn't retrain
+
+    small = MazeSolver(makeMazeArray(5), (1, 1), (9, 9), teleport=None, sparse=True)
+    with pytest.raises(ValueError):
+        small.load_q(tmp_path / "q.npy")
+
+
+def test_sparse_matches_dense_with_teleport_on_wall():
+    maze = makeMazeArray(5, seed=0)
+    assert maze[1, 2] == 1
+    kwargs = dict(teleport=(1, 2), backend="value_iteration")
+    sparse = MazeSolver(maze, (1, 1), (9, 9), sparse=True, **kwargs)
+    dense = MazeSolver(maze, (1, 1), (9, 9), **kwargs)
+    sparse.train()
+    dense.train()
+    assert sparse.greedy_states()[2]
+    assert sparse.solve() == dense.solve()
+
+
+def test_value_iteration_waits_for_the_goal_to_reach_the_start():
+    # The goal's value is below tol by the time it has spread 150 steps, this path is 185
+    maze = makeMazeArray(15, seed=3)
+    solver = MazeSolver(maze, (1, 1), (29, 29), teleport=None, sparse=True, backend="value_iteration")
+    solver.train()
+    states, _, reached = solver.greedy_states()
+    assert reached and len(states) == 185
+    assert solver.solve()[-1] == (29, 29)
+
+
+def test_solve_stops_when_greedy_policy_loops():
+    solver = make_solver(np.float64)
+    solver.Q[:] = 0  # Untrained: every state moves up, which loops against the top wall
+    solver.trained = True
+    path = solver.solve()
+    assert path[-1] != solver.goal and len(path) == len(set(path))
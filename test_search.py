@@ -0,0 +1,22 @@
+import numpy as np
+from mazegen import makeMazeArray
+from search import shortest_path
+
+METHODS = ("field", "bfs", "astar", "bidirectional")
+
+
+def test_methods_agree_on_teleports():
+    maze = makeMazeArray(5, seed=0)
+    assert maze[1, 2] == 1 and maze[5, 5] != 1
+    # None, off the grid (MazeSolver's default and past maze.size), on a wall and on an open cell
+    for teleport in [None, (5, 15), (40, 40), (1, 2), (5, 5)]:
+        paths = {method: shortest_path(maze, (1, 1), (9, 9), teleport, method) for method in METHODS}
+        lengths = {method: len(path) for method, path in paths.items()}
+        assert len(set(lengths.values())) == 1, (teleport, lengths)
+        for path in paths.values():
+            assert path[0] == (1, 1) and path[-1] == (9, 9)
+            steps = np.abs(np.diff(path, axis=0)).sum(axis=1)
+            assert all(step == 1 or cell == (9, 9) for step, cell in zip(steps, path[1:]))
+
+    # The unreachable teleports give the same path as no teleport at all
+    assert len(shortest_path(maze, (1, 1), (9, 9), (1, 2))) == len(shortest_path(maze, (1, 1), (9, 9)))